@@ -1,58 +1,21 @@
 """Our GUI is based on Tkinter and our database is made with SQLite3.
-    We import ttk and messagebox to have additional GUI features."""
+    We import messagebox to have additional GUI features."""
 import logging
 from tkinter import *
-from tkinter import ttk, messagebox
-import sqlite3
+from tkinter import messagebox
+
+import repository
+import search_index
+import startup
+from db_worker import worker
+from tree_views import PagedTreeView
 
 """We are using logging to log the errors (if any) to a log file named app.log. In reality there is no chance of 
 errors as this code has been thoroughly tested but consider this an additional feature we decided to implement just 
-in case the user faces an issue. """
-
-logging.basicConfig(filename='app.log', filemode='w', format='%(name)s - %(levelname)s - %(message)s')
-
-"""Here we connect our Python code with the SQLite3 database and declare the cursors."""
-"""Repair this (DATABASE)"""
-
-"""In these sqlite3 commands we are checking everytime if the table exists instead of just creating the table once 
-and not including those commands at all because in case the user accidentally deletes the database files, they won't 
-face any issues as this code will automatically create the database files again."""
-
-conn = sqlite3.connect('question_bank.db', timeout=10)
-curr = conn.cursor()
-
-
-class TreeView(Frame):
-    """We are inheriting the tkinter object, Frame here so that we can treat this class as the object itself when it
-    comes to creating the UI for our app.
-
-    One could say that we are using polymorphism here as we are using the same class to create three different
-    types of TreeViews and have a search function in this class which work with all different TreeViews. """
-
-    def __init__(self, master, columns):
-        Frame.__init__(self, master)
-        self.grid_rowconfigure(0, weight=1)
-        self.grid_columnconfigure(0, weight=1)
-        self.tree = ttk.Treeview(self, column=columns, show='headings')
-        self.tree.grid(row=0, column=0, sticky='NEWS')
+in case the user faces an issue. The log is set up by startup.setup_logging when the features are launched."""
 
-    def search(self, query):
-
-        """This function is the core of our search functionality. It takes and stores the user query from the search
-        entry to a private? variable and then iterates through all the children in the TreeView and tries to compare
-        the search query in lowercase with all relevant TreeView children values in lowercase. If it finds a match,
-        it will append the value of that child to a list we name selections. Then we select the items in selections
-        visually in our TreeView to show the results to the user. """
-
-        _selections = []
-        for child in self.tree.get_children():
-            if query.lower() in self.tree.item(child)['values'][1].lower():
-                _selections.append(child)
-
-            if query in str(self.tree.item(child)['values'][0]):
-                _selections.append(child)
-        self.tree.selection_set(_selections)
-        _selections = []
+"""All the database access goes through the repository module, which lends us a pooled connection for every query
+instead of one global connection and cursor shared by every frame."""
 
 
 class MainFrame(Tk):
@@ -102,11 +65,11 @@ class ModuleClass(Frame):
 
     def __init__(self, master):
         Frame.__init__(self, master)
-        rows = curr.execute('''SELECT ID, Name, Code FROM Modules''').fetchall()
 
         """TreeView variables"""
         columns = ("column1", "column2", "column3")
-        self.module_tree = TreeView(self, columns)
+        self.module_tree = PagedTreeView(self, columns, ModuleClass.fetch_modules, key_column=2,
+                                         search_rows=ModuleClass.search_modules, table='modules')
         self.module_tree.tree.heading('#1', text='Module Code')
         self.module_tree.tree.heading('#2', text='Module Name')
         self.module_tree.tree.heading('#3', text="ID")
@@ -194,7 +157,9 @@ class ModuleClass(Frame):
             self.search_button_iframe.grid(row=2, column=0, pady=20, sticky='w')
             self.search_button = Button(self, text="search", command=self.search_view)
             self.search_button.grid(row=1, column=3, pady=20, sticky='ew')
-            self._search_quit_button = Button(self.search_module_frame, text="Quit", command=self.forget_bottom_frames)
+            self._search_quit_button = Button(self.search_module_frame, text="Quit",
+                                              command=lambda: [self.module_tree.clear_search(),
+                                                               self.forget_bottom_frames()])
             self._search_quit_button.grid(row=2, column=1, sticky='e', pady=20)
             self.search_module_frame.grid(row=2, column=1, columnspan=2)
         except Exception as e:
@@ -229,17 +194,25 @@ class ModuleClass(Frame):
     def update_module_tree(self):
 
         """Function to refresh the list of all children in our module TreeView. The function first deletes all the
-        children currently present in our TreeView and then fetches it again from the database and inserts it into
-        the TreeView."""
+        children currently present in our TreeView and then fetches the first page of them again from the database
+        and inserts it into the TreeView. The rest is fetched page by page as the user scrolls down."""
         try:
-            self.module_tree.tree.delete(*self.module_tree.tree.get_children())
-            curr.execute('''SELECT code,name,ID FROM modules''')
-            rows = curr.fetchall()
-            for row in rows:
-                self.module_tree.tree.insert("", END, values=row)
+            self.module_tree.refresh()
         except Exception as e:
             messagebox.showerror(title="Error", message=e)
 
+    @staticmethod
+    def fetch_modules(after, limit):
+        """A function to fetch the page of modules which comes after the module ID after"""
+        return repository.fetch_all('''SELECT code,name,ID FROM modules WHERE ID > ? ORDER BY ID LIMIT ?''',
+                                    (after or 0, limit))
+
+    @staticmethod
+    def search_modules(query):
+        """A function to fetch the modules whose name or code matches the query, best match first"""
+        return search_index.fetch_rows('''SELECT code,name,ID FROM modules WHERE ID IN ({})''',
+                                       search_index.search_modules(query), key_column=2)
+
     def edit_module_database(self, name, code):
 
         """Function which is used to edit the Modules database using the name and code provided from the user. """
@@ -253,18 +226,10 @@ class ModuleClass(Frame):
                                                    parent=self.edit_module_frame)
                 if message_edit > 0:
                     if code == str(self.module_tree.tree.item(self.module_tree.tree.focus())['values'][0]):
-                        curr.execute('''UPDATE Modules SET name = ? , code = ? WHERE ID = ?''',
-                                     (name, code, id_q))
-                        conn.commit()
-                        self.update_module_tree()
+                        worker.submit(self, repository.update_module, id_q, name, code)
                     else:
-                        if self.check_module_duplicate(code) == 1:
-                            messagebox.showinfo(message="Module code already exists in database")
-                        else:
-                            curr.execute('''UPDATE Modules SET name = ? , code = ? WHERE ID = ?''',
-                                         (name, code, id_q))
-                            conn.commit()
-                            self.update_module_tree()
+                        worker.submit(self, self.update_module_unless_duplicate, id_q, name, code,
+                                      on_done=warn_if_duplicate("Module code already exists in database"))
         except Exception as e:
             print(e)
 
@@ -278,11 +243,7 @@ class ModuleClass(Frame):
             id_m = (self.module_tree.tree.item(self.module_tree.tree.focus())['values'][2])
             message_delete = messagebox.askyesno("Confirmation", "Do you want to permanently delete this module?")
             if message_delete > 0:
-                curr.execute('''DELETE FROM Modules WHERE ID=(?)''', (id_m,))
-                curr.execute('''DELETE FROM Questions WHERE Module_ID=(?)''', (id_m,))
-
-                conn.commit()
-                self.update_module_tree()
+                worker.submit(self, repository.delete_module, id_m)
 
         except Exception as e:
             messagebox.showerror(title="Error", message=e)
@@ -294,16 +255,34 @@ class ModuleClass(Frame):
         module code as the query and store that value in response. If fetched is not none, there are duplicates and
         hence we can execute appropriate code dependent on the value of fetched."""
 
-        response = conn.execute("SELECT EXISTS(SELECT 1 FROM Modules WHERE code=?)", (code,))
-        fetched = response.fetchone()[0]
+        fetched = repository.fetch_one("SELECT EXISTS(SELECT 1 FROM Modules WHERE code=?)", (code,))[0]
         return fetched
 
+    @staticmethod
+    def update_module_unless_duplicate(id_m, name, code):
+        """A function for the database worker to update a module, unless another module already has the new code. It
+        returns whether the module was updated."""
+        if ModuleClass.check_module_duplicate(code) == 1:
+            return False
+        repository.update_module(id_m, name, code)
+        return True
+
+    @staticmethod
+    def add_module_unless_duplicate(name, code):
+        """A function for the database worker to add a module, unless a module already has the code. It returns
+        whether the module was added."""
+        if ModuleClass.check_module_duplicate(code) == 1:
+            return False
+        repository.add_module(name, code)
+        return True
+
     def add_module(self):
 
         """Function containing code specific to adding module to the database."""
         """The sql statement below would ensure the autoincrement ID gets set properly instead of having ghost value 
         rows. We do this so that the value does not overflow in the far future. """
-        curr.execute('''UPDATE sqlite_sequence SET seq = (SELECT MAX(ID) FROM modules) WHERE name="modules"''')
+        worker.submit(self, repository.execute,
+                      '''UPDATE sqlite_sequence SET seq = (SELECT MAX(ID) FROM modules) WHERE name="modules"''')
         self.add_module_frame.grid(row=2, column=0)
 
         Label(self.add_module_frame, text="Module name").grid(row=0, column=0, columnspan=2)
@@ -324,12 +303,8 @@ class ModuleClass(Frame):
         if name == "" or code == "":
             messagebox.showinfo("Invalid input", "Module name and code fields can not be empty.")
         else:
-            if self.check_module_duplicate(code) == 1:
-                messagebox.showinfo(message="Module code already exists in database")
-            else:
-                curr.execute('''INSERT INTO Modules(Name,Code) VALUES(?,?)''', (name, code,))
-                conn.commit()
-                self.update_module_tree()
+            worker.submit(self, self.add_module_unless_duplicate, name, code,
+                          on_done=warn_if_duplicate("Module code already exists in database"))
 
 
 class AnswerClass(Frame):
@@ -337,8 +312,9 @@ class AnswerClass(Frame):
 
     def __init__(self, master):
         Frame.__init__(self, master)
+        self.id_q = None
         columns = ("column1", "column2", "column3")
-        self.answer_treeview = TreeView(self, columns=columns)
+        self.answer_treeview = PagedTreeView(self, columns, self.fetch_answers, key_column=2, table='Answers')
         self.answer_treeview.tree.heading('#1', text='Answer')
         self.answer_treeview.tree.heading('#2', text='Is_Right')
         self.answer_treeview.tree.heading('#3', text="ID")
@@ -352,7 +328,6 @@ class AnswerClass(Frame):
         self._back_button.grid(row=1, column=0, pady=20, sticky='ew')
         self.edit_button = Button(self, text="Edit", command=self.edit_answer)
         self.edit_button.grid(row=1, column=1, pady=20, sticky='ew')
-        self.id_q = None
         self.edit_answer_frame = Frame(self)
 
     def edit_answer(self):
@@ -395,10 +370,7 @@ class AnswerClass(Frame):
                 message_edit = messagebox.askyesno("Confirmation", "Do you want to permanently update this question?",
                                                    parent=self.edit_answer_frame)
                 if message_edit > 0:
-                    curr.execute('''UPDATE Answers SET answer = ? , Is_Right = ? WHERE ID = ?''',
-                                 (name, code, id_q))
-                    conn.commit()
-                    self.update_answer_tree()
+                    worker.submit(self, repository.update_answer, id_q, name, code)
 
         except Exception as e:
             print(e)
@@ -408,13 +380,14 @@ class AnswerClass(Frame):
         self.master.switch_frame(QuestionClass)
 
     def update_answer_tree(self):
-        self.answer_treeview.tree.delete(*self.answer_treeview.tree.get_children())
+        """A function to show the first page of answers of the selected question in the answer TreeView"""
         self.id_q = Receptor.id_q
+        self.answer_treeview.refresh()
 
-        curr.execute('''SELECT Answer,Is_Right,ID FROM Answers WHERE Question_ID=(?)''', (self.id_q,))
-        rows = curr.fetchall()
-        for row in rows:
-            self.answer_treeview.tree.insert("", END, values=row)
+    def fetch_answers(self, after, limit):
+        """A function to fetch the page of answers of the selected question which comes after the answer ID after"""
+        return repository.fetch_all('''SELECT Answer,Is_Right,ID FROM Answers WHERE Question_ID=(?) AND ID > ?
+        ORDER BY ID LIMIT ?''', (self.id_q, after or 0, limit))
 
 
 class ScrollableFrame(Frame):
@@ -476,9 +449,16 @@ class ScrollableFrame(Frame):
 def add_answer_db(question_id, answer_text, is_correct):
     if answer_text == "":
         messagebox.showerror(title="Error", message="Please ensure all the fields are filled")
-    curr.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right) VALUES(?,?,?)''',
-                 (question_id, answer_text, is_correct,))
-    conn.commit()
+    repository.add_answer(question_id, answer_text, is_correct)
+
+
+def warn_if_duplicate(message):
+    """A function to make the callback of a database worker job which adds or updates a row unless it would be a
+    duplicate. The callback shows message when the job reports that nothing was saved."""
+    def warn(saved):
+        if not saved:
+            messagebox.showinfo(message=message)
+    return warn
 
 
 class QuestionClass(Frame):
@@ -488,8 +468,10 @@ class QuestionClass(Frame):
     def __init__(self, master):
         Frame.__init__(self, master)
         self.grid(row=0, column=0, sticky='news', padx=10, pady=10)
+        self.id_m = None
         columns = ("column1", "column2", "column3", "column4", "column5")
-        self.tv = TreeView(self, columns=columns)
+        self.tv = PagedTreeView(self, columns, self.fetch_questions, key_column=3,
+                                search_rows=self.search_questions, table='Questions')
         self.tv.tree.heading('#1', text='Question')
         self.tv.tree.heading('#2', text='Type')
         self.tv.tree.heading('#3', text="Mark")
@@ -524,23 +506,17 @@ class QuestionClass(Frame):
         self.single_correct_frame = ScrollableFrame(self)
         self.multiple_correct_frame = ScrollableFrame(self)
         self.true_false_frame = ScrollableFrame(self)
-        self.id_m = None
         self.id_q = None
         self.question_text = StringVar()
 
-    def add_question_db(self, question_text, mark, question_type, module_id):
-        """A function to add questions to the database."""
+    def add_question_db(self, question_text, mark, question_type, module_id, answers):
+        """A function to add a question and its answers to the database. answers is a list of (answer, is_right,
+        description) tuples, and the question and all of them are saved together in one transaction."""
         if question_text == "" or mark == "":
             messagebox.showerror(title="Error", message="Please ensure all the fields are filled")
         else:
-            if self.check_question_duplicate(question_text) == 1:
-                curr.execute('''UPDATE Questions SET Question = ? , Mark = ? , Type = ? WHERE Question = ?''',
-                             (question_text, mark, question_type, question_text,))
-                messagebox.showinfo(message="Question already exists in database")
-            else:
-                curr.execute('''INSERT INTO Questions(Question,Mark,Type,Module_ID) VALUES(?,?,?,?)''',
-                             (question_text, mark, question_type, module_id,))
-                conn.commit()
+            worker.submit(self, self.create_question_unless_duplicate, question_text, mark, question_type, module_id,
+                          answers, on_done=warn_if_duplicate("Question already exists in database"))
 
     def check_edit_focus(self):
 
@@ -587,18 +563,24 @@ class QuestionClass(Frame):
                                       command=lambda: [self.tv.search(search_entry.get())])
         search_button_iframe.grid(row=2, column=1, pady=20, sticky='w')
         search_quit_button = Button(self.search_question_frame, text="Quit",
-                                    command=self.search_question_frame.grid_forget)
+                                    command=lambda: [self.tv.clear_search(), self.search_question_frame.grid_forget()])
         search_quit_button.grid(row=2, column=1, sticky='e', pady=20)
 
     def update_question_treeview(self):
-        """A function to update the question TreeView based on the selected module"""
-        self.tv.tree.delete(*self.tv.tree.get_children())
+        """A function to update the question TreeView based on the selected module. Only the first page of questions
+        is loaded here, the rest follows as the user scrolls."""
         self.id_m = Receptor.id_m
+        self.tv.refresh()
 
-        curr.execute('''SELECT Question,Type,Mark,ID,Module_ID FROM Questions WHERE MODULE_ID=(?)''', (self.id_m,))
-        rows = curr.fetchall()
-        for row in rows:
-            self.tv.tree.insert("", END, values=row)
+    def fetch_questions(self, after, limit):
+        """A function to fetch the page of questions of the selected module which comes after the question ID after"""
+        return repository.fetch_all('''SELECT Question,Type,Mark,ID,Module_ID FROM Questions WHERE MODULE_ID=(?)
+        AND ID > ? ORDER BY ID LIMIT ?''', (self.id_m, after or 0, limit))
+
+    def search_questions(self, query):
+        """A function to fetch the questions of the selected module whose text matches the query, best match first"""
+        return search_index.fetch_rows('''SELECT Question,Type,Mark,ID,Module_ID FROM Questions WHERE ID IN ({})''',
+                                       search_index.search_questions(query, self.id_m), key_column=3)
 
     def edit_question(self):
 
@@ -641,10 +623,7 @@ class QuestionClass(Frame):
                 message_edit = messagebox.askyesno("Confirmation", "Do you want to permanently update this question?",
                                                    parent=self.edit_question_frame)
                 if message_edit > 0:
-                    curr.execute('''UPDATE Questions SET question = ? , mark = ? WHERE ID = ?''',
-                                 (name, code, id_q))
-                    conn.commit()
-                    self.update_question_treeview(),
+                    worker.submit(self, repository.update_question, id_q, name, code)
 
         except Exception as e:
             print(e)
@@ -657,11 +636,7 @@ class QuestionClass(Frame):
             message_delete = messagebox.askyesno("Confirmation", "Do you want to permanently delete this module?")
             if message_delete > 0:
                 self.forget_bottom_frames()
-                curr.execute('''DELETE FROM Questions WHERE ID=(?)''', (id_q,))
-                curr.execute('''DELETE FROM Answers WHERE Question_ID=(?)''', (id_q,))
-                conn.commit()
-                conn.commit()
-                self.update_question_treeview()
+                worker.submit(self, repository.delete_question, id_q)
 
         except Exception as e:
             print(e)
@@ -670,10 +645,18 @@ class QuestionClass(Frame):
     def check_question_duplicate(question):
         """A function to check for duplicate questions in the database"""
 
-        response = conn.execute("SELECT EXISTS(SELECT 1 FROM Questions WHERE Question=?)", (question,))
-        fetched = response.fetchone()[0]
+        fetched = repository.fetch_one("SELECT EXISTS(SELECT 1 FROM Questions WHERE Question=?)", (question,))[0]
         return fetched
 
+    @staticmethod
+    def create_question_unless_duplicate(question_text, mark, question_type, module_id, answers):
+        """A function for the database worker to add a question and its answers, unless the question is already in
+        the database. It returns whether the question was added."""
+        if QuestionClass.check_question_duplicate(question_text) == 1:
+            return False
+        repository.create_question_with_answers(question_text, mark, question_type, module_id, answers)
+        return True
+
     def add_question(self):
         """A function to configure the frame placement for add question. It has three buttons based on the three question types(Single correct, Multiple correct and True/False)"""
         self.forget_bottom_frames()
@@ -696,8 +679,6 @@ class QuestionClass(Frame):
 
     def add_multiple_choice_question(self):
         """A function which configures the frame grid placement for adding multiple correct option questions"""
-        """The sqlite3 statement below would basically help us prevent having gaps in our autoincrement IDs"""
-        curr.execute('''UPDATE sqlite_sequence SET seq = (SELECT MAX(ID) FROM questions) WHERE name="questions"''')
         self.multiple_correct_frame.grid(row=3, column=0, sticky='NSEW', columnspan=5)
         self.multiple_correct_frame.interior.grid_columnconfigure([0, 1, 2, 3, 4], weight=1)
         Label(self.multiple_correct_frame.interior, text="Question Text").grid(row=0, column=0, columnspan=5, pady=10)
@@ -749,32 +730,17 @@ class QuestionClass(Frame):
         mark.grid(row=15, column=0, columnspan=5, pady=10)
         question_type = "Multiple choice"
 
-        def add_ans():
-            """A function to get the information out of the add question frame"""
-            add_all_answers(self.multiple_option_1.get(), self.multiple_checkbutton_var_1.get(),
-                            self.multiple_description.get())
-            add_all_answers(self.multiple_option_2.get(), self.multiple_checkbutton_var_2.get(),
-                            self.multiple_description.get())
-            add_all_answers(self.multiple_option_3.get(), self.multiple_checkbutton_var_3.get(),
-                            self.multiple_description.get())
-            add_all_answers(self.multiple_option_4.get(), self.multiple_checkbutton_var_4.get(),
-                            self.multiple_description.get())
-
-        def add_all_answers(answer, is_correct, description):
-            """A function which takes in the information entered to add questions and then adds all of that to the database"""
-            curr.execute('SELECT max(id) FROM Questions')
-            max_id = curr.fetchone()[0]
-
-            curr.execute(
-                '''INSERT INTO Answers(Question_ID, Answer, Is_Right, Description) VALUES(?,?,?,?)''',
-                (int(max_id), answer, is_correct, description,))
-
-            conn.commit()
+        def get_answers():
+            """A function to get the answers out of the add question frame"""
+            description = self.multiple_description.get()
+            return [(self.multiple_option_1.get(), self.multiple_checkbutton_var_1.get(), description),
+                    (self.multiple_option_2.get(), self.multiple_checkbutton_var_2.get(), description),
+                    (self.multiple_option_3.get(), self.multiple_checkbutton_var_3.get(), description),
+                    (self.multiple_option_4.get(), self.multiple_checkbutton_var_4.get(), description)]
 
         submit_button = Button(self.multiple_correct_frame.interior, text='Submit', command=lambda: [
-            self.add_question_db(multiple_question_text.get(), mark.get(), question_type, module_id=Receptor.id_m, ),
-            add_ans(),
-            self.update_question_treeview()])
+            self.add_question_db(multiple_question_text.get(), mark.get(), question_type, module_id=Receptor.id_m,
+                                 answers=get_answers())])
         submit_button.grid(row=16, column=0, columnspan=5, pady=10)
         quit_button = Button(self.multiple_correct_frame.interior, text='Quit',
                              command=self.multiple_correct_frame.grid_forget)
@@ -782,7 +748,6 @@ class QuestionClass(Frame):
 
     def add_single_choice_question(self):
         """A function to configure the frame placement and objects in the frame to add single correct questions"""
-        curr.execute('''UPDATE sqlite_sequence SET seq = (SELECT MAX(ID) FROM questions) WHERE name="questions"''')
         self.single_correct_frame.grid(row=3, column=0, sticky='NSEW', columnspan=5)
         self.single_correct_frame.interior.grid_columnconfigure([0, 1, 2, 3, 4], weight=1)
         Label(self.single_correct_frame.interior, text="Question Text").grid(row=0, column=0, columnspan=5, pady=10)
@@ -829,25 +794,16 @@ class QuestionClass(Frame):
             else:
                 return 0
 
-        def add_ans():
-            """A function to get all the information from the add single correct choice question frame"""
-            add_all_answers(option_1.get(), is_correct(1), description_4.get())
-            add_all_answers(option_2.get(), is_correct(2), description_4.get())
-            add_all_answers(option_3.get(), is_correct(3), description_4.get())
-            add_all_answers(option_4.get(), is_correct(4), description_4.get())
-
-        def add_all_answers(answer, is_right_option, description):
-            """A function to add all the information entered in the add question frame to the database"""
-            curr.execute('SELECT max(id) FROM Questions')
-            max_id = curr.fetchone()[0]
-
-            curr.execute(
-                '''INSERT INTO Answers(Question_ID, Answer, Is_Right, description) VALUES(?,?,?,?)''',
-                (max_id, answer, int(is_right_option), description))
-            conn.commit()
+        def get_answers():
+            """A function to get all the answers from the add single correct choice question frame"""
+            return [(option_1.get(), is_correct(1), description_4.get()),
+                    (option_2.get(), is_correct(2), description_4.get()),
+                    (option_3.get(), is_correct(3), description_4.get()),
+                    (option_4.get(), is_correct(4), description_4.get())]
+
         submit_button = Button(self.single_correct_frame.interior, text='Submit', command=lambda: [
-            self.add_question_db(question_text.get(), mark.get(), question_type, module_id=Receptor.id_m, ), add_ans(),
-            self.update_question_treeview()])
+            self.add_question_db(question_text.get(), mark.get(), question_type, module_id=Receptor.id_m,
+                                 answers=get_answers())])
         submit_button.grid(row=16, column=0, columnspan=5, pady=10)
         quit_button = Button(self.single_correct_frame.interior, text='Quit',
                              command=self.single_correct_frame.grid_forget)
@@ -855,7 +811,6 @@ class QuestionClass(Frame):
 
     def add_true_false_question(self):
         """A function to configure the objects inside the frame to add true false questions"""
-        curr.execute('''UPDATE sqlite_sequence SET seq = (SELECT MAX(ID) FROM questions) WHERE name="questions"''')
         self.true_false_frame.grid(row=3, column=0, sticky='NEWS', columnspan=5)
         self.true_false_frame.interior.grid_columnconfigure([0, 1, 2, 3, 4], weight=1)
         Label(self.true_false_frame.interior, text="Question Text").grid(row=0, column=0, columnspan=5, pady=5)
@@ -873,27 +828,17 @@ class QuestionClass(Frame):
         mark.grid(row=5, column=0, columnspan=5, pady=5)
         question_type = "True/False"
 
-        def add_all_answers(answer):
-            """A function to add all the information entered in the add true false question frame to the database"""
-            curr.execute('SELECT max(id) FROM Questions')
-            max_id = curr.fetchone()[0]
-
-            if answer == "True":
-                curr.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right) VALUES(?,?,?)''',
-                             (max_id, answer, 1,))
-                curr.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right) VALUES(?,?,?)''',
-                             (max_id, "False", 0,))
-            elif answer == "False":
-                curr.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right) VALUES(?,?,?)''',
-                             (max_id, "True", 0,))
-                curr.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right) VALUES(?,?,?)''',
-                             (max_id, answer, 1,))
-            conn.commit()
+        def add_true_false(answer):
+            """A function to add the question entered in the add true false question frame to the database with the
+            True and False answers, one of them marked right"""
+            if answer not in options:
+                messagebox.showerror(title="Error", message="Please choose whether the statement is True or False")
+                return
+            self.add_question_db(question_text.get(), mark.get(), question_type, module_id=Receptor.id_m,
+                                 answers=[("True", answer == "True", None), ("False", answer == "False", None)])
 
         submit_button = Button(self.true_false_frame.interior, text='Submit', command=lambda: [
-            self.add_question_db(question_text.get(), mark.get(), question_type, module_id=Receptor.id_m, ),
-            add_all_answers(clicked.get()),
-            self.update_question_treeview()])
+            add_true_false(clicked.get())])
         submit_button.grid(row=16, column=0, columnspan=5, pady=10)
         quit_button = Button(self.true_false_frame.interior, text='Quit', command=self.true_false_frame.grid_forget)
         quit_button.grid(row=17, column=0, columnspan=5, pady=5)
@@ -913,22 +858,29 @@ class Launch:
         self.splash_root = None
 
     def splash(self):
+        """A function to show the splash screen while the main window is set up. The splash is closed as soon as the
+        main window is ready instead of after a fixed time."""
+        startup.setup_logging()
         self.splash_root = Tk()
         set_geometry(self.splash_root, 300, 400)
         img = PhotoImage(master=self.splash_root, file='res/quiz.png')
         Label(self.splash_root, image=img).pack()
-        self.splash_root.after(1000, self.main)
-        mainloop()
+        self.splash_root.update()
+        app = self.main()
+        app.mainloop()
 
     def main(self):
-        # destroy splash window
-        self.splash_root.destroy()
         # Execute tkinter
         app = MainFrame()
         set_geometry(app, app.winfo_screenheight(), app.winfo_screenwidth())
         app.title("Quiztion")
         app.grid_rowconfigure(1, weight=1)
         app.grid_columnconfigure(0, weight=1)
+        app.update_idletasks()
+        # destroy splash window now that the main window is ready
+        self.splash_root.destroy()
+        startup.ready(app, 'admin')
+        return app
 
 
 launch = Launch()
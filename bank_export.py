@@ -0,0 +1,191 @@
+"""A command to export the modules, the questions with their answers or the results of question_bank.db to CSV, JSON
+lines or Parquet files.
+
+Questions are exported in the shape bank_import.py reads: in CSV and Parquet one row per answer with the columns
+module_code, module_name, question, type, mark, answer, is_right and description, and in JSON lines one object per
+question with a list of its answers. An exported bank can therefore be imported again into another database.
+
+Rows are read with fetchmany a batch at a time from a single SELECT, so memory use stays the same however many rows
+there are. The database is in WAL mode, so the SELECT reads one consistent snapshot without blocking the app, which can
+keep writing while an export runs.
+
+    python bank_export.py questions -o questions.jsonl
+    python bank_export.py results --format csv > results.csv
+    python bank_export.py results --format parquet -o results.parquet
+
+Parquet needs the pyarrow package, which the app itself does not need."""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import repository
+
+"""For each kind of export the SELECT that streams it and its columns with their types. The types are only used to
+give Parquet files a fixed schema."""
+EXPORTS = {
+    'modules': ('''SELECT ID, Name, Code FROM modules ORDER BY ID''',
+                [('id', 'int'), ('name', 'text'), ('code', 'int')]),
+    'questions': ('''SELECT m.Code, m.Name, q.Question, q.Type, q.Mark, a.Answer, a.Is_Right, a.Description, q.ID
+    FROM Questions q LEFT JOIN modules m ON m.ID = q.Module_ID LEFT JOIN Answers a ON a.Question_ID = q.ID
+    ORDER BY q.ID, a.ID''',
+                  [('module_code', 'int'), ('module_name', 'text'), ('question', 'text'), ('type', 'text'),
+                   ('mark', 'int'), ('answer', 'text'), ('is_right', 'bool'), ('description', 'text')]),
+    'results': ('''SELECT r.id, r.module_id, m.Code, m.Name, r.number_of_questions, r.number_of_correct_answers,
+    r.time_taken FROM results r LEFT JOIN modules m ON m.ID = r.module_id ORDER BY r.id''',
+                [('id', 'int'), ('module_id', 'int'), ('module_code', 'int'), ('module_name', 'text'),
+                 ('number_of_questions', 'int'), ('number_of_correct_answers', 'int'), ('time_taken', 'text')]),
+}
+
+
+class Progress:
+    """A small class to count the rows written and print how fast it is going every so many rows"""
+
+    def __init__(self, every=100000, out=sys.stderr):
+        self.every = every
+        self.out = out
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def count(self, rows):
+        """A function to pass rows through while counting them"""
+        for row in rows:
+            yield row
+            self.rows += 1
+            if self.rows % self.every == 0:
+                self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0
+        print(f'{self.rows} rows exported, {rate:.0f} rows/s', file=self.out)
+
+
+def stream_rows(sql, batch_size=1000):
+    """A function to yield the rows of a SELECT, fetching batch_size of them at a time. The pooled connection is held
+    until the last row has been read."""
+    with repository.pool.connection() as con:
+        cursor = con.execute(sql)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+
+def question_rows(rows):
+    """A function to turn the rows of the questions SELECT into flat rows of the export, one per answer"""
+    for *row, _question_id in rows:
+        if row[6] is not None:
+            row[6] = bool(row[6])
+        yield row
+
+
+def question_records(rows):
+    """A function to group the rows of the questions SELECT, which come ordered by question, into one dict per
+    question with a list of its answers, the shape of a JSON lines record of bank_import.py"""
+    record = None
+    question_id = None
+    for code, name, question, question_type, mark, answer, is_right, description, row_question_id in rows:
+        if record is None or row_question_id != question_id:
+            if record is not None:
+                yield record
+            question_id = row_question_id
+            record = {'module_code': code, 'module_name': name, 'question': question, 'type': question_type,
+                      'mark': mark, 'answers': []}
+        if answer is not None:
+            record['answers'].append({'answer': answer, 'is_right': bool(is_right), 'description': description})
+    if record is not None:
+        yield record
+
+
+def write_csv(rows, columns, file):
+    writer = csv.writer(file)
+    writer.writerow([name for name, _type in columns])
+    for row in rows:
+        writer.writerow(int(value) if isinstance(value, bool) else value for value in row)
+
+
+def write_jsonl(records, file):
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False))
+        file.write('\n')
+
+
+def write_parquet(rows, columns, path, batch_size):
+    """A function to write rows to a Parquet file, one row group per batch, so only one batch is ever held in
+    memory"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit('Exporting to Parquet needs the pyarrow package, install it with: pip install pyarrow')
+    types = {'int': pyarrow.int64(), 'text': pyarrow.string(), 'bool': pyarrow.bool_()}
+    schema = pyarrow.schema([(name, types[column_type]) for name, column_type in columns])
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            data = {name: [row[i] for row in batch] for i, (name, _type) in enumerate(columns)}
+            writer.write_table(pyarrow.Table.from_pydict(data, schema=schema))
+
+
+def export(kind, file_format, output, batch_size=1000):
+    """A function to export one kind of data to a file in one of the formats. output is a path, or None for the
+    standard output, which Parquet does not support."""
+    sql, columns = EXPORTS[kind]
+    progress = Progress()
+    rows = stream_rows(sql, batch_size)
+    if file_format == 'parquet':
+        if output is None:
+            raise SystemExit('A Parquet export needs an output file, give one with -o')
+        if kind == 'questions':
+            rows = question_rows(rows)
+        write_parquet(progress.count(rows), columns, output, batch_size)
+        return progress
+
+    file = open(output, 'w', newline='', encoding='utf-8') if output is not None else sys.stdout
+    try:
+        if file_format == 'csv':
+            if kind == 'questions':
+                rows = question_rows(rows)
+            write_csv(progress.count(rows), columns, file)
+        else:
+            if kind == 'questions':
+                records = question_records(rows)
+            else:
+                names = [name for name, _type in columns]
+                records = (dict(zip(names, row)) for row in rows)
+            write_jsonl(progress.count(records), file)
+    finally:
+        if output is not None:
+            file.close()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the question bank or the results')
+    parser.add_argument('kind', choices=sorted(EXPORTS), help='what to export')
+    parser.add_argument('-o', '--output', help='the file to write, by default the standard output')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'],
+                        help='the format to write, by default taken from the extension of the output file or jsonl')
+    parser.add_argument('--batch-size', type=int, default=1000, help='the number of rows fetched at a time')
+    arguments = parser.parse_args(argv)
+
+    file_format = arguments.format
+    if file_format is None:
+        extension = os.path.splitext(arguments.output or '')[1].lower().lstrip('.')
+        file_format = extension if extension in ('csv', 'parquet') else 'jsonl'
+    progress = export(arguments.kind, file_format, arguments.output, arguments.batch_size)
+    progress.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""A command to import whole question banks into question_bank.db from CSV or JSON lines files.
+
+A CSV file has a header row with the columns module_code, module_name, question, type, mark, answer, is_right and
+description, and one row per answer; the rows of the answers of a question follow each other. A JSON lines file has
+one question per line:
+
+    {"module_code": 1179, "module_name": "Math", "question": "2 + 2 = ?", "type": "Single choice", "mark": 1,
+     "answers": [{"answer": "4", "is_right": true, "description": ""}, {"answer": "5", "is_right": false}]}
+
+The file is read one question at a time and written in large batches, each batch in one transaction with
+executemany, so memory use stays the same however big the file is. Modules are looked up by their code and created
+when they do not exist yet. Questions whose text is already in the database are skipped, which is the check
+check_question_duplicate does for the admin forms.
+
+    python bank_import.py questions.csv
+    python bank_import.py questions.jsonl --batch-size 5000 --allow-duplicates"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import repository
+
+QUESTION_TYPES = ('Multiple choice', 'Single choice', 'True/False')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'f', '')
+"""The most parameters one lookup is given, well under the 999 older builds of SQLite allow in a statement"""
+MAX_VARIABLES = 500
+
+
+def read_csv(file):
+    """A function to read the questions of a CSV file one at a time. It yields the line number a question starts on
+    and the question as a dict in the same shape as a JSON lines record."""
+    question = None
+    start = None
+    for row in csv.DictReader(file):
+        key = (row.get('module_code'), row.get('question'))
+        if question is None or key != (question['module_code'], question['question']):
+            if question is not None:
+                yield start, question
+            start = file_line(file)
+            question = {'module_code': row.get('module_code'), 'module_name': row.get('module_name'),
+                        'question': row.get('question'), 'type': row.get('type'), 'mark': row.get('mark'),
+                        'answers': []}
+        question['answers'].append({'answer': row.get('answer'), 'is_right': row.get('is_right'),
+                                    'description': row.get('description')})
+    if question is not None:
+        yield start, question
+
+
+def file_line(file):
+    """A function to get a line number for the error messages of a CSV file, if the file can tell it"""
+    return getattr(file, 'line_number', None)
+
+
+def read_jsonl(file):
+    """A function to read the questions of a JSON lines file one at a time. Lines which are not valid JSON are
+    yielded as a ValueError so they are reported like any other invalid question."""
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'not valid JSON: {e}')
+
+
+def parse_bool(value):
+    """A function to read whether an answer is right from a JSON boolean or a CSV cell"""
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'is_right should be true or false, not {value!r}')
+
+
+def validate(record):
+    """A function to check a question and return it cleaned up as (module_code, module_name, question, type, mark,
+    answers). It raises a ValueError saying what is wrong with it if it can not be imported."""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('a question should be an object')
+    module_code = str(record.get('module_code') or '').strip()
+    question = str(record.get('question') or '').strip()
+    question_type = str(record.get('type') or '').strip()
+    if not module_code:
+        raise ValueError('module_code is missing')
+    try:
+        module_code = int(module_code)
+    except ValueError:
+        raise ValueError(f'module_code should be a whole number, not {record.get("module_code")!r}')
+    if not question:
+        raise ValueError('question is missing')
+    if question_type not in QUESTION_TYPES:
+        raise ValueError(f'type should be one of {", ".join(QUESTION_TYPES)}, not {question_type!r}')
+    try:
+        mark = int(record.get('mark'))
+    except (TypeError, ValueError):
+        raise ValueError(f'mark should be a whole number, not {record.get("mark")!r}')
+
+    answers = []
+    for answer in record.get('answers') or []:
+        if not isinstance(answer, dict):
+            raise ValueError(f'an answer should be an object, not {answer!r}')
+        text = str(answer.get('answer') or '').strip()
+        if not text:
+            raise ValueError('an answer is empty')
+        answers.append((text, parse_bool(answer.get('is_right')), answer.get('description') or None))
+    if not answers:
+        raise ValueError('the question has no answers')
+    if not any(is_right for _text, is_right, _description in answers):
+        raise ValueError('none of the answers is right')
+    module_name = str(record.get('module_name') or '').strip()
+    return module_code, module_name, question, question_type, mark, answers
+
+
+class Importer:
+    """A class which writes validated questions to the database in batches and keeps count of what it has done. The
+    IDs of the new questions and answers are handed out by the importer itself while the batch holds the write lock,
+    which is what lets whole batches go in with executemany."""
+
+    def __init__(self, batch_size=1000, allow_duplicates=False, progress=sys.stderr):
+        self.batch_size = batch_size
+        self.allow_duplicates = allow_duplicates
+        self.progress = progress
+        self.module_ids = {}
+        self.questions = 0
+        self.answers = 0
+        self.modules = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.batches = 0
+        self.started = None
+
+    def run(self, records):
+        """A function to import every (line number, record) pair from a reader, one batch at a time"""
+        self.started = time.perf_counter()
+        batch = []
+        for line_number, record in records:
+            try:
+                batch.append(validate(record))
+            except ValueError as e:
+                self.invalid += 1
+                print(f'line {line_number}: skipped, {e}', file=self.progress)
+                continue
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+        if self.batches == 0:
+            self.report()
+        return self
+
+    def write_batch(self, batch):
+        """A function to write one batch of questions and their answers in one transaction. The modules it creates
+        are only remembered once the transaction has been committed."""
+        module_ids, modules = dict(self.module_ids), self.modules
+        with repository.pool.connection() as con:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                batch = self.resolve_modules(con, batch)
+                if not self.allow_duplicates:
+                    batch = self.remove_duplicates(con, batch)
+                question_id = next_id(con, 'Questions')
+                answer_id = next_id(con, 'Answers')
+                question_rows = []
+                answer_rows = []
+                for module_code, _module_name, question, question_type, mark, answers in batch:
+                    question_rows.append((question_id, question, question_type, mark, self.module_ids[module_code]))
+                    for text, is_right, description in answers:
+                        answer_rows.append((answer_id, text, description, int(is_right), question_id))
+                        answer_id += 1
+                    question_id += 1
+                con.executemany('''INSERT INTO Questions(ID, Question, Type, Mark, Module_ID) VALUES(?,?,?,?,?)''',
+                                question_rows)
+                con.executemany('''INSERT INTO Answers(ID, Answer, Description, Is_Right, Question_ID)
+                VALUES(?,?,?,?,?)''', answer_rows)
+                con.commit()
+            except BaseException:
+                con.rollback()
+                self.module_ids, self.modules = module_ids, modules
+                raise
+        self.questions += len(question_rows)
+        self.answers += len(answer_rows)
+        self.batches += 1
+        self.report()
+
+    def resolve_modules(self, con, batch):
+        """A function to find the IDs of the modules of a batch by their code, creating the modules which do not
+        exist yet. The IDs are remembered so every module is only looked up once per import. It returns the batch
+        without the questions of modules which do not exist and have no module_name to create them with, which are
+        counted as invalid."""
+        codes = {}
+        for module_code, module_name, *_rest in batch:
+            if module_code not in self.module_ids and not codes.get(module_code):
+                codes[module_code] = module_name
+        if not codes:
+            return batch
+        for chunk in chunks(list(codes)):
+            placeholders = ','.join('?' * len(chunk))
+            for module_id, code in con.execute(f'SELECT ID, Code FROM modules WHERE Code IN ({placeholders})', chunk):
+                self.module_ids[code] = module_id
+        for code, name in codes.items():
+            if code not in self.module_ids and name:
+                cursor = con.execute('INSERT INTO modules(Name, Code) VALUES(?,?)', (name, code))
+                self.module_ids[code] = cursor.lastrowid
+                self.modules += 1
+        resolved = [entry for entry in batch if entry[0] in self.module_ids]
+        if len(resolved) < len(batch):
+            missing = sorted({entry[0] for entry in batch if entry[0] not in self.module_ids})
+            self.invalid += len(batch) - len(resolved)
+            print(f'{len(batch) - len(resolved)} questions skipped, modules {", ".join(map(str, missing))} do not '
+                  f'exist and no module_name was given to create them', file=self.progress)
+        return resolved
+
+    def remove_duplicates(self, con, batch):
+        """A function to drop the questions of a batch whose text is already in the database or earlier in the
+        batch"""
+        existing = set()
+        for chunk in chunks(list({question for _code, _name, question, *_rest in batch})):
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in con.execute(
+                f'SELECT Question FROM Questions WHERE Question IN ({placeholders})', chunk))
+        unique = []
+        for entry in batch:
+            if entry[2] in existing:
+                self.duplicates += 1
+            else:
+                existing.add(entry[2])
+                unique.append(entry)
+        return unique
+
+    def report(self):
+        """A function to print how far the import is and how fast it is going"""
+        elapsed = time.perf_counter() - self.started
+        rows = self.questions + self.answers
+        rate = rows / elapsed if elapsed > 0 else 0
+        print(f'{self.questions} questions and {self.answers} answers imported, {self.duplicates} duplicates and '
+              f'{self.invalid} invalid skipped, {rate:.0f} rows/s', file=self.progress)
+
+
+def chunks(values, size=MAX_VARIABLES):
+    """A function to split a list into lists of at most size values, for queries with one parameter per value"""
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+def next_id(con, table):
+    """A function to get the first free ID of an AUTOINCREMENT table. It is the highest of the largest ID in the table
+    and the largest one SQLite has ever handed out for it, so deleted IDs are never used again."""
+    return con.execute('''SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+    COALESCE((SELECT MAX(ID) FROM ''' + table + '''), 0)) + 1''', (table,)).fetchone()[0]
+
+
+class LineCountingFile:
+    """A small wrapper around a text file which counts the lines read from it, so CSV errors can name a line"""
+
+    def __init__(self, file):
+        self.file = file
+        self.line_number = 0
+
+    def __iter__(self):
+        for line in self.file:
+            self.line_number += 1
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import questions and answers into the question bank')
+    parser.add_argument('file', help='a CSV or JSON lines file')
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='the format of the file, by default taken from its extension')
+    parser.add_argument('--batch-size', type=int, default=1000, help='the number of questions per transaction')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help='import questions even if a question with the same text exists')
+    arguments = parser.parse_args(argv)
+
+    file_format = arguments.format
+    if file_format is None:
+        file_format = 'csv' if os.path.splitext(arguments.file)[1].lower() == '.csv' else 'jsonl'
+    with open(arguments.file, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            file = LineCountingFile(file)
+            records = read_csv(file)
+        else:
+            records = read_jsonl(file)
+        importer = Importer(arguments.batch_size, arguments.allow_duplicates).run(records)
+    print(f'{importer.modules} new modules created', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
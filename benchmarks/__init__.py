@@ -0,0 +1,7 @@
+"""Benchmarks for the question bank. generate builds synthetic question_bank.db files of any size and run times the
+quiz, report, achievements, tree and search code against one, saving the timings as JSON so two runs can be
+compared.
+
+    python -m benchmarks.generate bench.db --modules 20 --questions 5000 --results 200000
+    python -m benchmarks.run --database bench.db --json before.json
+    python -m benchmarks.run --database bench.db --compare before.json"""
@@ -0,0 +1,128 @@
+"""A generator for synthetic question banks. It creates a database with the schema of the app, through the same
+migrations App.create_db runs, and fills it with modules, questions of every type with their answers, and quiz
+results spread over the last year. The same arguments and seed always give the same database, so benchmark runs on
+two machines or two commits measure the same data.
+
+    python -m benchmarks.generate bench.db --modules 20 --questions 5000 --answers 4 --results 200000"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import migrations
+
+WORDS = ('python', 'list', 'tuple', 'string', 'loop', 'class', 'object', 'method', 'prime', 'number', 'matrix',
+         'vector', 'graph', 'tree', 'sort', 'search', 'recursion', 'memory', 'pointer', 'network', 'query', 'index',
+         'function', 'variable', 'integer', 'float', 'boolean', 'module', 'package', 'exception')
+QUESTION_TYPES = ('Multiple choice', 'Single choice', 'True/False')
+BATCH_SIZE = 10000
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_questions(rng, modules, questions, answers):
+    """A function to yield (question row, answer rows) for every question of every module"""
+    question_id = 0
+    answer_id = 0
+    for module_id in range(1, modules + 1):
+        for _ in range(questions):
+            question_id += 1
+            question_type = rng.choice(QUESTION_TYPES)
+            question = (question_id, f'{sentence(rng, 6)} {question_id}?', question_type, rng.randint(1, 3),
+                        module_id, rng.randint(0, 500))
+            if question_type == 'True/False':
+                texts = ['True', 'False']
+                right = {rng.randrange(2)}
+            else:
+                texts = [sentence(rng, 3) for _ in range(answers)]
+                count = rng.randint(1, max(1, answers - 1)) if question_type == 'Multiple choice' else 1
+                right = set(rng.sample(range(len(texts)), count))
+            rows = []
+            for i, text in enumerate(texts):
+                answer_id += 1
+                rows.append((answer_id, text, sentence(rng, 5) if rng.random() < 0.3 else None, int(i in right),
+                             question_id))
+            yield question, rows
+
+
+def generate_results(rng, modules, results, number_of_questions=5):
+    """A function to yield result rows, one quiz on a random module at a random time in the last year each"""
+    start = datetime(2025, 1, 1)
+    for result_id in range(1, results + 1):
+        time_taken = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        yield (result_id, rng.randint(1, modules), number_of_questions, rng.randint(0, number_of_questions),
+               time_taken.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def generate(path, modules=10, questions=1000, answers=4, results=10000, seed=1):
+    """A function to build a synthetic question bank at path, replacing any file that is there. The counts of
+    questions are per module."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode=WAL')
+    con.execute('PRAGMA synchronous=OFF')
+    migrations.migrate(con)
+
+    con.execute('BEGIN')
+    con.executemany('INSERT INTO modules(ID, Name, Code) VALUES(?,?,?)',
+                    [(i, f'Module {i} {rng.choice(WORDS)}', 1000 + i) for i in range(1, modules + 1)])
+    question_rows = []
+    answer_rows = []
+    for question, answer_list in generate_questions(rng, modules, questions, answers):
+        question_rows.append(question)
+        answer_rows.extend(answer_list)
+        if len(question_rows) >= BATCH_SIZE:
+            insert_questions(con, question_rows, answer_rows)
+            question_rows, answer_rows = [], []
+    insert_questions(con, question_rows, answer_rows)
+
+    result_rows = []
+    for result in generate_results(rng, modules, results):
+        result_rows.append(result)
+        if len(result_rows) >= BATCH_SIZE:
+            insert_results(con, result_rows)
+            result_rows = []
+    insert_results(con, result_rows)
+    con.commit()
+    con.execute('PRAGMA optimize')
+    con.close()
+    return path
+
+
+def insert_questions(con, question_rows, answer_rows):
+    con.executemany('''INSERT INTO Questions(ID, Question, Type, Mark, Module_ID, Number) VALUES(?,?,?,?,?,?)''',
+                    question_rows)
+    con.executemany('''INSERT INTO Answers(ID, Answer, Description, Is_Right, Question_ID) VALUES(?,?,?,?,?)''',
+                    answer_rows)
+
+
+def insert_results(con, result_rows):
+    con.executemany('''INSERT INTO results(id, module_id, number_of_questions, number_of_correct_answers, time_taken)
+    VALUES(?,?,?,?,?)''', result_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a synthetic question bank for benchmarking')
+    parser.add_argument('path', help='the database file to create, an existing one is replaced')
+    parser.add_argument('--modules', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=1000, help='the number of questions per module')
+    parser.add_argument('--answers', type=int, default=4, help='the number of answers per choice question')
+    parser.add_argument('--results', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    arguments = parser.parse_args(argv)
+    started = time.perf_counter()
+    generate(arguments.path, arguments.modules, arguments.questions, arguments.answers, arguments.results,
+             arguments.seed)
+    print(f'{arguments.path} generated in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""The benchmarks of the question bank. Micro benchmarks time one small piece of code in memory, like grading an
+answer; macro benchmarks time a whole thing the app does against the database, like loading a quiz or the first page
+of the achievements. Every benchmark is run a fixed number of times per repeat, after one warm up call, with a fixed
+random seed, and the time per call is reported as the best, the median and the mean of the repeats.
+
+The benchmarks run on a copy of the database given with --database, or on a synthetic one generated with the sizes
+given, so the file itself is never changed. The TreeView benchmarks need a display and are reported as skipped
+without one. The TreeViews fetch their rows on the database worker, so those benchmarks wait for the worker after
+every call and time the whole round trip.
+
+    python -m benchmarks.run --json before.json
+    python -m benchmarks.run --database bench.db --only search --compare before.json"""
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import repository
+import search_index
+from benchmarks.generate import QUESTION_TYPES, generate
+from question_answers import QuestionBank
+from quiz_engine import QuizSession, build_answer_key
+from reports import ModuleReport, build_report, fetch_question_usage
+from sampler import ModuleSampler
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    """An exception a benchmark raises while it is set up to say it can not run here"""
+
+
+def benchmark(name, kind, number):
+    """A decorator to register a benchmark. The decorated function sets the benchmark up and returns the function to
+    time, which is called number times per repeat."""
+    def register(setup):
+        BENCHMARKS.append((name, kind, number, setup))
+        return setup
+    return register
+
+
+class NullBuffer:
+    """A stand-in for the write-behind buffer which drops the usage counters the quizzes of the benchmarks make, so
+    they are neither timed nor written to the copy of the database"""
+
+    def add_usage(self, question_id, count=1):
+        pass
+
+    def add_result(self, module, number_of_questions, number_of_correct_answers):
+        pass
+
+    def flush(self):
+        pass
+
+
+class Context:
+    """The things the benchmarks share: a seeded random generator and a module with questions to work on"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.module_id, self.module = repository.fetch_one('''SELECT ID, Name FROM modules
+        WHERE ID IN (SELECT Module_ID FROM Questions) ORDER BY ID LIMIT 1''')
+        self.buffer = NullBuffer()
+        random.seed(seed)
+        self.session = self.new_session()
+
+    def new_session(self):
+        return QuizSession(self.module, buffer=self.buffer).start()
+
+
+@benchmark('grade', 'micro', 10000)
+def grade_benchmark(context):
+    session = context.session
+    options = [(question, answer.answer) for question in session.questions for answer in question.answers]
+
+    def run():
+        for question, option in options:
+            session.grade(question, option)
+    return run
+
+
+@benchmark('build_answer_key', 'micro', 10000)
+def answer_key_benchmark(context):
+    questions = context.session.questions
+    return lambda: build_answer_key(questions)
+
+
+@benchmark('report_statistics', 'micro', 1000)
+def report_statistics_benchmark(context):
+    report = build_report(context.module_id, with_usage=False)
+    totals = repository.fetch_one('''SELECT attempts, score_sum, score_sum_squares, min_score, max_score
+    FROM module_scores WHERE module_id = ?''', (context.module_id,))
+    return lambda: ModuleReport(context.module_id, report.histogram, [], totals)
+
+
+@benchmark('match_query', 'micro', 10000)
+def match_query_benchmark(context):
+    return lambda: search_index.match_query('python list.append() tuple')
+
+
+@benchmark('sampler_draw_100k', 'micro', 1000)
+def sampler_draw_benchmark(context):
+    """Drawing a quiz of five questions, two of them True/False, from a module of 100000 questions, leaving out the
+    questions of the last three quizzes"""
+    rng = context.rng
+    rows = [(question_id, f'question {question_id}', question_id, 'True', None, 1) for question_id in range(1, 100001)]
+    usage = [(question_id, rng.choice(QUESTION_TYPES), rng.randint(1, 3), rng.randint(0, 500))
+             for question_id in range(1, 100001)]
+    sampler = ModuleSampler('benchmark', QuestionBank.from_rows(rows), usage, refresh_interval=float('inf'))
+    recent = collections.deque(maxlen=15)
+
+    def run():
+        questions = sampler.draw(5, rng, {'True/False': 2}, recent)
+        recent.extend(question.id for question in questions)
+    return run
+
+
+@benchmark('quiz_load', 'macro', 100)
+def quiz_load_benchmark(context):
+    return context.new_session
+
+
+@benchmark('quiz_load_uncached', 'macro', 100)
+def quiz_load_uncached_benchmark(context):
+    """Loading a quiz straight from the database, as it was before the question cache"""
+    return lambda: QuizSession(context.module, buffer=context.buffer, cache=None).start()
+
+
+@benchmark('quiz_take', 'macro', 100)
+def quiz_take_benchmark(context):
+    """Loading a quiz and answering every question, without finishing it so the database is not written"""
+    rng = context.rng
+
+    def run():
+        session = context.new_session()
+        while not session.is_complete:
+            session.answer(rng.choice([answer.answer for answer in session.current_question.answers] or ['']))
+    return run
+
+
+@benchmark('report', 'macro', 100)
+def report_benchmark(context):
+    def run():
+        report = build_report(context.module_id, with_usage=False)
+        fetch_question_usage(report.module_id, None, 100)
+    return run
+
+
+def get_results():
+    try:
+        from quiz_features import Achievements
+    except ImportError as e:
+        raise Skip(f'tkinter is not available: {e}')
+    return Achievements.get_results
+
+
+@benchmark('achievements_first_page', 'macro', 200)
+def achievements_first_page_benchmark(context):
+    results = get_results()
+    return lambda: results(None, 50)
+
+
+@benchmark('achievements_deep_page', 'macro', 200)
+def achievements_deep_page_benchmark(context):
+    results = get_results()
+    count = repository.fetch_one('SELECT COUNT(*) FROM results')[0]
+    middle = repository.fetch_one('''SELECT time_taken, id FROM results ORDER BY time_taken DESC, id DESC
+    LIMIT 1 OFFSET ?''', (count // 2,))
+    if middle is None:
+        raise Skip('there are no results')
+    return lambda: results(tuple(middle), 50)
+
+
+def make_root():
+    """A function to make a hidden Tk window for the TreeView benchmarks, if there is a display to make it on"""
+    try:
+        import tkinter
+    except ImportError as e:
+        raise Skip(f'tkinter is not available: {e}')
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        raise Skip(f'no display: {e}')
+    root.withdraw()
+    return root
+
+
+def question_tree(context):
+    """A function to make the question TreeView of the admin features, showing the questions of the module"""
+    root = make_root()
+    from tree_views import PagedTreeView
+
+    def fetch_questions(after, limit):
+        return repository.fetch_all('''SELECT Question,Type,Mark,ID,Module_ID FROM Questions WHERE MODULE_ID=(?)
+        AND ID > ? ORDER BY ID LIMIT ?''', (context.module_id, after or 0, limit))
+
+    return PagedTreeView(root, ['question', 'type', 'mark', 'id', 'module'], fetch_questions, key_column=3,
+                         search_rows=lambda query: search_questions(query, context.module_id))
+
+
+def wait_for_worker():
+    """A function to wait until the database worker has fetched the rows a TreeView asked for and they are shown"""
+    from db_worker import worker
+    worker.run_until_idle()
+
+
+def search_questions(query, module_id=None):
+    """The search the question TreeView of the admin features makes"""
+    return search_index.fetch_rows('''SELECT Question,Type,Mark,ID,Module_ID FROM Questions WHERE ID IN ({})''',
+                                   search_index.search_questions(query, module_id), key_column=3)
+
+
+@benchmark('tree_refresh', 'macro', 50)
+def tree_refresh_benchmark(context):
+    tree = question_tree(context)
+
+    def run():
+        tree.refresh()
+        wait_for_worker()
+    return run
+
+
+@benchmark('tree_scroll_10_pages', 'macro', 10)
+def tree_scroll_benchmark(context):
+    tree = question_tree(context)
+
+    def run():
+        tree.refresh()
+        wait_for_worker()
+        for _ in range(9):
+            tree.load_more()
+            wait_for_worker()
+    return run
+
+
+@benchmark('tree_search', 'macro', 50)
+def tree_search_benchmark(context):
+    tree = question_tree(context)
+
+    def run():
+        tree.search('pyth')
+        wait_for_worker()
+    return run
+
+
+@benchmark('search_questions', 'macro', 200)
+def search_questions_benchmark(context):
+    return lambda: search_questions('pyth')
+
+
+@benchmark('search_questions_in_module', 'macro', 200)
+def search_questions_in_module_benchmark(context):
+    return lambda: search_questions('list tree', context.module_id)
+
+
+@benchmark('search_answers', 'macro', 200)
+def search_answers_benchmark(context):
+    return lambda: search_index.search_answers('memory')
+
+
+def measure(function, number, repeat):
+    """A function to time a function and return the seconds per call of every repeat"""
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return timings
+
+
+def run(only=None, repeat=5, seed=1, scale=1.0):
+    """A function to run the benchmarks whose name contains only, or all of them, and return their results. scale
+    multiplies the number of calls per repeat, to make quick runs or steadier ones."""
+    context = Context(seed)
+    results = {}
+    for name, kind, number, setup in BENCHMARKS:
+        if only and only not in name:
+            continue
+        try:
+            function = setup(context)
+        except Skip as e:
+            results[name] = {'kind': kind, 'skipped': str(e)}
+            continue
+        number = max(1, int(number * scale))
+        timings = measure(function, number, repeat)
+        results[name] = {'kind': kind, 'number': number, 'repeat': repeat, 'min_us': min(timings) * 1e6,
+                         'median_us': statistics.median(timings) * 1e6, 'mean_us': statistics.mean(timings) * 1e6}
+    return results
+
+
+def describe_database():
+    counts = {}
+    for table in ('modules', 'Questions', 'Answers', 'results'):
+        counts[table] = repository.fetch_one(f'SELECT COUNT(*) FROM {table}')[0]
+    return counts
+
+
+def print_results(results, baseline=None):
+    print(f"{'benchmark':<30}{'kind':<7}{'median us':>14}{'min us':>14}" + (f"{'before':>14}{'change':>9}"
+                                                                            if baseline else ''))
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f"{name:<30}{result['kind']:<7}  skipped, {result['skipped']}")
+            continue
+        line = f"{name:<30}{result['kind']:<7}{result['median_us']:>14.2f}{result['min_us']:>14.2f}"
+        old = (baseline or {}).get(name)
+        if old and 'median_us' in old:
+            line += f"{old['median_us']:>14.2f}{result['median_us'] / old['median_us'] - 1:>+9.1%}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the question bank benchmarks')
+    parser.add_argument('--database', help='a database to benchmark a copy of, by default a generated one')
+    parser.add_argument('--modules', type=int, default=10, help='the size of the generated database')
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--answers', type=int, default=4)
+    parser.add_argument('--results', type=int, default=10000)
+    parser.add_argument('--only', help='only run the benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='a factor for the number of calls per repeat')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='a file to save the results to')
+    parser.add_argument('--compare', help='a file saved with --json by an earlier run to compare against')
+    arguments = parser.parse_args(argv)
+    if arguments.database and not os.path.exists(arguments.database):
+        parser.error(f'{arguments.database} does not exist')
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'question_bank.db')
+        if arguments.database:
+            with sqlite3.connect(arguments.database) as source, sqlite3.connect(database) as target:
+                source.backup(target)
+            source.close()
+            target.close()
+        else:
+            print('generating the database', file=sys.stderr)
+            generate(database, arguments.modules, arguments.questions, arguments.answers, arguments.results,
+                     arguments.seed)
+        repository.pool.database = database
+        try:
+            results = run(arguments.only, arguments.repeat, arguments.seed, arguments.scale)
+            output = {'meta': {'date': datetime.now().isoformat(timespec='seconds'),
+                               'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                               'platform': platform.platform(), 'database': arguments.database or 'generated',
+                               'rows': describe_database(), 'seed': arguments.seed},
+                      'results': results}
+        finally:
+            repository.pool.close()
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)['results']
+    print_results(results, baseline)
+    if arguments.json:
+        with open(arguments.json, 'w') as file:
+            json.dump(output, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""A background worker which runs database work off the Tk main loop. A Tk callback hands the worker a function to
+run instead of running it itself; the worker thread runs the functions one after another, in the order they were
+handed in, and their results are passed back to callbacks on the Tk thread, which polls for them with after(). A
+locked database or a slow query then makes only that one piece of the UI wait, while the window keeps redrawing and
+answering clicks.
+
+While work has been running for longer than busy_delay milliseconds an indeterminate progress bar is shown in the
+corner of the window and the cursor turns into a watch, so the user can see that something is happening.
+
+The change events of the repository are sent from whichever thread made the change, which is the worker thread for
+every change made through it. on_ui_thread wraps a listener so it is always called on the Tk thread, because Tk
+widgets must only be touched from there."""
+import logging
+import queue
+import threading
+import time
+from tkinter import TclError, messagebox, ttk
+
+
+class DatabaseWorker:
+    """A class owning the worker thread and the queues between it and the Tk thread. The thread is started when the
+    first piece of work is submitted."""
+
+    def __init__(self, poll_interval=20, busy_delay=300):
+        self.poll_interval = poll_interval
+        self.busy_delay = busy_delay
+        self.pending = 0
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = None
+        self._ui_thread = None
+        self._roots = {}
+        self._busy_since = None
+
+    def submit(self, widget, function, *args, on_done=None, on_error=None):
+        """A function to run function(*args) on the worker thread. When it returns, on_done is called on the Tk thread
+        with its result, and when it raises, on_error is called with the exception; without on_error the error is
+        logged and shown in a message box. Neither is called if widget has been destroyed in the meantime."""
+        self.attach(widget)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='database-worker', daemon=True)
+            self._thread.start()
+        if self.pending == 0:
+            self._busy_since = time.monotonic()
+        self.pending += 1
+        self._jobs.put((widget, function, args, on_done, on_error))
+
+    def on_ui_thread(self, listener):
+        """A function to wrap a listener so that it runs on the Tk thread however it is called. Called on the Tk
+        thread, it runs straight away; called from another thread, it is queued for the next poll."""
+        def call(*args):
+            if threading.current_thread() is self._ui_thread:
+                listener(*args)
+            else:
+                self._results.put((None, listener, args, False))
+        return call
+
+    def attach(self, widget):
+        """A function to start polling for results in the window of a widget, if that window is not polled yet"""
+        self._ui_thread = threading.current_thread()
+        root = widget.winfo_toplevel()
+        if root not in self._roots:
+            self._roots[root] = None
+            root.after(self.poll_interval, self._poll, root)
+
+    def _run(self):
+        while True:
+            widget, function, args, on_done, on_error = self._jobs.get()
+            try:
+                result = function(*args)
+            except Exception as e:
+                self._results.put((widget, on_error or self.show_error, (e,), True))
+            else:
+                self._results.put((widget, on_done, (result,), True))
+
+    def process_results(self):
+        """A function to call the callbacks of every result that has arrived. It has to be called on the Tk thread."""
+        while True:
+            try:
+                widget, callback, args, is_job = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if is_job:
+                self.pending -= 1
+                if self.pending == 0:
+                    self._busy_since = None
+            if callback is None or widget is not None and not widget_exists(widget):
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(e)
+
+    def run_until_idle(self, timeout=30):
+        """A function to wait on the Tk thread until every submitted job has finished and its callback has run, for
+        scripts and benchmarks which need the result before they go on"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            self.process_results()
+            time.sleep(0.001)
+        self.process_results()
+
+    def _poll(self, root):
+        """A function which runs every poll_interval milliseconds in a window for as long as the window exists"""
+        if not widget_exists(root):
+            self._roots.pop(root, None)
+            return
+        try:
+            self.process_results()
+            self._show_busy(root)
+            root.after(self.poll_interval, self._poll, root)
+        except TclError:
+            self._roots.pop(root, None)
+
+    def _show_busy(self, root):
+        """A function to show the progress bar in a window while work has been running for longer than busy_delay,
+        and to hide it again when the work is done"""
+        busy = self._busy_since is not None and (time.monotonic() - self._busy_since) * 1000 >= self.busy_delay
+        indicator = self._roots.get(root)
+        if busy and indicator is None:
+            indicator = ttk.Progressbar(root, mode='indeterminate', length=120)
+            indicator.place(relx=1.0, rely=1.0, anchor='se')
+            indicator.start(15)
+            root.configure(cursor='watch')
+            self._roots[root] = indicator
+        elif not busy and indicator is not None:
+            indicator.destroy()
+            root.configure(cursor='')
+            self._roots[root] = None
+
+    @staticmethod
+    def show_error(error):
+        logging.error(error)
+        messagebox.showerror(title="Error", message=error)
+
+
+def widget_exists(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except TclError:
+        return False
+
+
+worker = DatabaseWorker()
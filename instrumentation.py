@@ -0,0 +1,204 @@
+"""Timers and counters for finding out what is slow while the app is in use, without a profiler attached.
+
+When instrumentation is enabled the connection pool makes its connections with TimedConnection, so every SQL
+statement is timed from the moment it is executed until its rows have been fetched, and the major operations of the
+app (refreshing a TreeView, starting a quiz, grading an answer, building a report) are timed by the timed decorator.
+The numbers go into a rolling stats table which can be printed at any time with print_stats(), and statements slower
+than a threshold can also be written to a slow query log with their SQL and parameters.
+
+It is enabled with enable(), or for a whole run of the app with environment variables:
+
+    QUIZ_STATS=1               print the stats table when the app exits
+    QUIZ_SLOW_QUERY_MS=50      log the statements taking 50 ms or more to slow_queries.log
+    QUIZ_SLOW_QUERY_LOG=path   log them to another file
+
+When it is not enabled the timers only cost a check of a flag."""
+import atexit
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import deque
+from functools import lru_cache, wraps
+from time import perf_counter
+
+import repository
+
+slow_query_logger = logging.getLogger('quiztion.slow_queries')
+
+
+class Stats:
+    """A class which keeps count of how often every named operation ran and how long it took, in total and over its
+    last window calls, which is what the percentiles are worked out from"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.enabled = False
+        self.slow_query_seconds = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, calls=1):
+        """A function to add a timing to an operation. Time with calls=0 is added to the last call, for work that
+        belongs to a call which was already counted, like fetching the rows of a query."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = [0, 0.0, 0.0, deque(maxlen=self.window)]
+            entry[0] += calls
+            entry[1] += seconds
+            recent = entry[3]
+            if calls or not recent:
+                recent.append(seconds)
+            else:
+                recent[-1] += seconds
+            entry[2] = max(entry[2], recent[-1])
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """A function to get the stats as a list of dicts, the operation taking the most time in total first"""
+        with self._lock:
+            entries = [(name, calls, total, longest, sorted(recent))
+                       for name, (calls, total, longest, recent) in self._entries.items()]
+        rows = []
+        for name, calls, total, longest, recent in entries:
+            rows.append({'name': name, 'calls': calls, 'total_ms': total * 1000,
+                         'mean_ms': total / calls * 1000 if calls else 0,
+                         'p50_ms': percentile(recent, 50) * 1000, 'p95_ms': percentile(recent, 95) * 1000,
+                         'max_ms': longest * 1000})
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def table(self, limit=30):
+        """A function to format the stats as a text table"""
+        lines = [f"{'calls':>8}{'total ms':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}  operation"]
+        for row in self.snapshot()[:limit]:
+            lines.append(f"{row['calls']:>8}{row['total_ms']:>12.1f}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}"
+                         f"{row['p95_ms']:>10.2f}{row['max_ms']:>10.2f}  {row['name']}")
+        return '\n'.join(lines)
+
+
+stats = Stats()
+
+
+def percentile(values, p):
+    """A function to get the nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))]
+
+
+@lru_cache(maxsize=1024)
+def query_name(sql):
+    """A function to name a statement in the stats by its SQL with the whitespace collapsed"""
+    return 'sql: ' + ' '.join(sql.split())
+
+
+def timed(name):
+    """A decorator which times every call of a function under a name when instrumentation is enabled. When it is not,
+    the function is called straight away."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return function(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.record(name, perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+class TimedCursor(sqlite3.Cursor):
+    """A cursor which records every statement it executes in the stats, together with the time taken to fetch its
+    rows"""
+
+    def execute(self, sql, parameters=()):
+        self._name = query_name(sql)
+        started = perf_counter()
+        try:
+            return sqlite3.Cursor.execute(self, sql, parameters)
+        finally:
+            log_query(self._name, sql, parameters, perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._name = query_name(sql)
+        started = perf_counter()
+        try:
+            return sqlite3.Cursor.executemany(self, sql, seq_of_parameters)
+        finally:
+            log_query(self._name, sql, '(executemany)', perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(sqlite3.Cursor.fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(sqlite3.Cursor.fetchall)
+
+    def _fetch(self, fetch, *args):
+        started = perf_counter()
+        try:
+            return fetch(self, *args)
+        finally:
+            if getattr(self, '_name', None) is not None:
+                stats.record(self._name, perf_counter() - started, calls=0)
+
+
+class TimedConnection(sqlite3.Connection):
+    """A connection whose cursors are TimedCursors, including the ones execute and executemany make, so every
+    statement run on the connection is timed"""
+
+    def cursor(self, factory=TimedCursor):
+        return sqlite3.Connection.cursor(self, factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def log_query(name, sql, parameters, seconds):
+    stats.record(name, seconds)
+    if stats.slow_query_seconds is not None and seconds >= stats.slow_query_seconds:
+        text = repr(parameters)
+        if len(text) > 500:
+            text = text[:500] + '...'
+        slow_query_logger.warning('%.1f ms: %s %s', seconds * 1000, ' '.join(sql.split()), text)
+
+
+def enable(slow_query_ms=None, slow_query_log='slow_queries.log', report_at_exit=False):
+    """A function to turn the instrumentation on. It has to be called before the first query, because only the
+    connections the pool opens afterwards are timed."""
+    stats.enabled = True
+    repository.pool.factory = TimedConnection
+    if slow_query_ms is not None:
+        stats.slow_query_seconds = slow_query_ms / 1000
+        if not slow_query_logger.handlers:
+            handler = logging.FileHandler(slow_query_log)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_query_logger.addHandler(handler)
+            slow_query_logger.propagate = False
+    if report_at_exit:
+        atexit.register(print_stats)
+
+
+def enable_from_environment():
+    """A function to turn the instrumentation on if the environment asks for it, see the top of this module"""
+    slow_query_ms = os.environ.get('QUIZ_SLOW_QUERY_MS')
+    if os.environ.get('QUIZ_STATS') or slow_query_ms:
+        enable(float(slow_query_ms) if slow_query_ms else None,
+               os.environ.get('QUIZ_SLOW_QUERY_LOG', 'slow_queries.log'), bool(os.environ.get('QUIZ_STATS')))
+
+
+def print_stats(file=sys.stderr):
+    print(stats.table(), file=file)
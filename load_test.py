@@ -0,0 +1,242 @@
+"""A load generator which simulates many people taking quizzes at the same time, to see how question_bank.db holds up
+under concurrency. Every simulated quiz taker runs the whole flow the app runs: get the modules, start a quiz on one of
+them, answer every question and finish the quiz, which writes the usage counters and the result. Optional writer
+threads edit questions at the same time, like the admin tool does.
+
+The load always runs against a copy of the database in a temporary directory, so the real question bank is never
+touched. Takers run as threads in this process, or with --processes spread over several processes, each with its own
+connection pool, which is how several copies of the app would share one database file.
+
+    python load_test.py --threads 16 --duration 30
+    python load_test.py --processes 4 --threads 8 --writers 1 --json baseline.json
+
+The report gives the throughput, the latency percentiles of every step and how many steps failed, with the failures
+caused by "database is locked" counted on their own. With --json the same numbers are saved, and with --compare they
+are printed next to the numbers of an earlier run."""
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_context
+
+import repository
+from question_cache import question_cache
+from quiz_engine import QuizSession
+from write_behind import WriteBehindBuffer
+
+STEPS = ('modules', 'start', 'answer', 'finish', 'quiz', 'write')
+
+
+class Stats:
+    """A class collecting the latency of every step and the errors. It only holds plain lists and counters, so the
+    stats of a process can be sent back to the parent and merged there."""
+
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = Counter()
+        self.quizzes = 0
+
+    def record(self, step, seconds):
+        self.latencies[step].append(seconds)
+
+    def error(self, step, error):
+        if isinstance(error, sqlite3.OperationalError) and 'locked' in str(error):
+            kind = 'database is locked'
+        else:
+            kind = f'{type(error).__name__}: {error}'
+        self.errors[(step, kind)] += 1
+
+    def merge(self, other):
+        for step in STEPS:
+            self.latencies[step].extend(other.latencies[step])
+        self.errors.update(other.errors)
+        self.quizzes += other.quizzes
+        return self
+
+    def summary(self, elapsed):
+        """A function to turn the stats into the numbers of the report"""
+        steps = {}
+        for step, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            latencies.sort()
+            steps[step] = {'count': len(latencies), 'per_second': len(latencies) / elapsed,
+                           'p50_ms': percentile(latencies, 50) * 1000, 'p95_ms': percentile(latencies, 95) * 1000,
+                           'p99_ms': percentile(latencies, 99) * 1000, 'max_ms': latencies[-1] * 1000}
+        attempts = sum(len(latencies) for step, latencies in self.latencies.items() if step != 'quiz')
+        attempts += sum(self.errors.values())
+        locked = sum(count for (_step, kind), count in self.errors.items() if kind == 'database is locked')
+        return {'elapsed': elapsed, 'quizzes': self.quizzes, 'quizzes_per_second': self.quizzes / elapsed,
+                'steps': steps, 'errors': {f'{step}: {kind}': count for (step, kind), count in self.errors.items()},
+                'error_rate': sum(self.errors.values()) / attempts if attempts else 0,
+                'locked_rate': locked / attempts if attempts else 0}
+
+
+def percentile(values, p):
+    """A function to get the nearest-rank percentile of a sorted list"""
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))]
+
+
+def copy_database(source, directory):
+    """A function to copy a database into a directory with SQLite's backup API, which also copies what is still only
+    in the write-ahead log of the source"""
+    target = os.path.join(directory, 'question_bank.db')
+    with sqlite3.connect(source) as source_con, sqlite3.connect(target) as target_con:
+        source_con.backup(target_con)
+    source_con.close()
+    target_con.close()
+    return target
+
+
+def timed(stats, step, function, *args):
+    """A function to run one step and record how long it took, or the error it failed with"""
+    started = time.perf_counter()
+    try:
+        result = function(*args)
+    except (sqlite3.Error, ValueError) as e:
+        stats.error(step, e)
+        raise
+    stats.record(step, time.perf_counter() - started)
+    return result
+
+
+def take_quizzes(deadline, seed, think_time):
+    """A function which plays one quiz taker until the deadline. It lists the modules like the app does, but only
+    takes the modules which have questions. It has a write-behind buffer of its own without a timer, so every finished
+    quiz is written straight away like in the app, and a failed write can be counted. The buffer is closed at the end,
+    so it does not stay registered to flush at exit."""
+    rng = random.Random(seed)
+    buffer = WriteBehindBuffer(flush_interval=None)
+    stats = Stats()
+    takeable = [row[0] for row in repository.fetch_all('''SELECT Name FROM modules
+    WHERE ID IN (SELECT Module_ID FROM Questions)''')]
+    while takeable and time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            timed(stats, 'modules', question_cache.modules)
+            session = timed(stats, 'start', QuizSession(rng.choice(takeable), buffer=buffer).start)
+            while not session.is_complete:
+                if think_time:
+                    time.sleep(rng.uniform(0, think_time))
+                options = [answer.answer for answer in session.current_question.answers] or ['']
+                timed(stats, 'answer', session.answer, rng.choice(options))
+            failed = buffer.failed_flushes
+            timed(stats, 'finish', session.finish)
+            if buffer.failed_flushes > failed:
+                stats.error('finish', buffer.last_error)
+                continue
+        except (sqlite3.Error, ValueError):
+            continue
+        stats.record('quiz', time.perf_counter() - started)
+        stats.quizzes += 1
+    buffer.close()
+    return stats
+
+
+def write_questions(deadline, seed):
+    """A function which plays an admin editing questions until the deadline, to put writes next to the quizzes. The
+    read of the question and its update are timed together as one write, and every failure of either is counted."""
+    rng = random.Random(seed)
+    stats = Stats()
+    question_ids = [row[0] for row in repository.fetch_all('SELECT ID FROM Questions')]
+    while question_ids and time.monotonic() < deadline:
+        try:
+            timed(stats, 'write', edit_question, rng.choice(question_ids))
+        except (sqlite3.Error, ValueError):
+            pass
+        time.sleep(0.01)
+    return stats
+
+
+def edit_question(question_id):
+    """A function to save a question again with its own text and mark, like an admin editing it"""
+    row = repository.fetch_one('SELECT Question, Mark FROM Questions WHERE ID = ?', (question_id,))
+    if row is not None:
+        repository.update_question(question_id, row[0], row[1])
+
+
+def run_worker(database, threads, writers, duration, seed, think_time, pool_size):
+    """A function which runs the takers and writers of one process against the database copy and returns their
+    merged stats. It is run in this process, or in each child process with --processes."""
+    # every failed write is logged by the write-behind buffer, which would drown the report
+    logging.getLogger().setLevel(logging.CRITICAL)
+    repository.pool.database = database
+    if pool_size:
+        repository.pool.size = pool_size
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=threads + writers) as executor:
+        futures = [executor.submit(take_quizzes, deadline, seed * 1000 + i, think_time) for i in range(threads)]
+        futures += [executor.submit(write_questions, deadline, seed * 1000 + threads + i) for i in range(writers)]
+        stats = Stats()
+        for future in futures:
+            stats.merge(future.result())
+    repository.pool.close()
+    return stats
+
+
+def print_report(summary, baseline=None):
+    print(f"{summary['quizzes']} quizzes in {summary['elapsed']:.1f}s, {summary['quizzes_per_second']:.1f} quizzes/s"
+          + (f" (baseline {baseline['quizzes_per_second']:.1f})" if baseline else ''))
+    print(f"{'step':<8}{'count':>9}{'per s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, numbers in summary['steps'].items():
+        print(f"{step:<8}{numbers['count']:>9}{numbers['per_second']:>10.1f}{numbers['p50_ms']:>10.2f}"
+              f"{numbers['p95_ms']:>10.2f}{numbers['p99_ms']:>10.2f}{numbers['max_ms']:>10.2f}")
+        if baseline and step in baseline['steps']:
+            old = baseline['steps'][step]
+            print(f"{'  before':<8}{old['count']:>9}{old['per_second']:>10.1f}{old['p50_ms']:>10.2f}"
+                  f"{old['p95_ms']:>10.2f}{old['p99_ms']:>10.2f}{old['max_ms']:>10.2f}")
+    print(f"error rate {summary['error_rate']:.2%}, database is locked rate {summary['locked_rate']:.2%}"
+          + (f" (baseline {baseline['error_rate']:.2%}, {baseline['locked_rate']:.2%})" if baseline else ''))
+    for error, count in summary['errors'].items():
+        print(f'  {count} x {error}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate many concurrent quiz takers against a copy of the database')
+    parser.add_argument('--database', default=repository.DATABASE, help='the database to copy and load')
+    parser.add_argument('--threads', type=int, default=8, help='the number of quiz takers per process')
+    parser.add_argument('--processes', type=int, default=1, help='the number of processes to run takers in')
+    parser.add_argument('--writers', type=int, default=0, help='the number of admin writers per process')
+    parser.add_argument('--duration', type=float, default=10, help='how many seconds to run for')
+    parser.add_argument('--think-time', type=float, default=0, help='the most seconds a taker waits before answering')
+    parser.add_argument('--pool-size', type=int, help='the size of the connection pool of every process')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='a file to save the results to')
+    parser.add_argument('--compare', help='a file saved with --json by an earlier run to compare against')
+    arguments = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = copy_database(arguments.database, directory)
+        started = time.perf_counter()
+        if arguments.processes > 1:
+            stats = Stats()
+            with ProcessPoolExecutor(arguments.processes, mp_context=get_context('spawn')) as executor:
+                futures = [executor.submit(run_worker, database, arguments.threads, arguments.writers,
+                                           arguments.duration, arguments.seed + i, arguments.think_time,
+                                           arguments.pool_size)
+                           for i in range(arguments.processes)]
+                for future in futures:
+                    stats.merge(future.result())
+        else:
+            stats = run_worker(database, arguments.threads, arguments.writers, arguments.duration, arguments.seed,
+                               arguments.think_time, arguments.pool_size)
+        summary = stats.summary(time.perf_counter() - started)
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+    print_report(summary, baseline)
+    if arguments.json:
+        with open(arguments.json, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
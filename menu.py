@@ -1,14 +1,55 @@
-import admin_features
-import quiz_features
+"""The menu the app starts with. The quiz features and the administrative features are only imported when their
+button is clicked, so the menu shows without loading either of them or opening the database. Run with
+--startup-time to measure how long the app takes to start, see the startup module."""
+import importlib
+import sys
 from tkinter import *
 
-window = Tk()
-window.geometry('700x300')
-window.rowconfigure([0, 1], weight=1)
-window.columnconfigure([0], weight=1)
-admin_button = Button(window, text="Administrative Functions", command=admin_features.launch.splash)
-admin_button.grid(row=0, column=0, sticky='news')
-quiz_button = Button(window, text="Take a Quiz", command=quiz_features.launch.launch)
-quiz_button.grid(row=1, column=0, sticky='news')
+import startup
 
-window.mainloop()
+instrumented = False
+
+
+def load(name):
+    """A function to import the quiz features or the administrative features the first time they are used. The
+    logging and the instrumentation are set up before the first of them, because they have to be before the first
+    query."""
+    global instrumented
+    if not instrumented:
+        startup.setup_logging()
+        import instrumentation
+        instrumentation.enable_from_environment()
+        instrumented = True
+    return importlib.import_module(name)
+
+
+def open_admin_features():
+    load('admin_features').launch.splash()
+
+
+def open_quiz():
+    load('quiz_features').launch.launch()
+
+
+def main():
+    window = Tk()
+    window.geometry('700x300')
+    window.rowconfigure([0, 1], weight=1)
+    window.columnconfigure([0], weight=1)
+    admin_button = Button(window, text="Administrative Functions", command=open_admin_features)
+    admin_button.grid(row=0, column=0, sticky='news')
+    quiz_button = Button(window, text="Take a Quiz", command=open_quiz)
+    quiz_button.grid(row=1, column=0, sticky='news')
+    startup.ready(window, 'menu')
+    if startup.probing() == 'admin':
+        window.after_idle(open_admin_features)
+    elif startup.probing() == 'quiz':
+        window.after_idle(open_quiz)
+    window.mainloop()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        startup.main(__file__, sys.argv[1:])
+    else:
+        main()
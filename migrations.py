@@ -0,0 +1,245 @@
+"""Versioned schema migrations for the question bank. The version a database file is at is kept in SQLite's
+user_version pragma, and every migration that is newer than that version is applied in order, each one in its own
+transaction together with the bump of the version. An existing question_bank.db is therefore upgraded in place the
+first time the app connects to it, and a new one is created from scratch the same way."""
+import sqlite3
+
+"""The statements which recompute the score aggregates of every module from the results table. They are used to fill
+the aggregates when they are first created and by the rebuild command in the reports module."""
+REBUILD_AGGREGATES = [
+    'DELETE FROM module_scores',
+    'DELETE FROM module_score_histogram',
+    '''INSERT INTO module_scores
+    SELECT module_id, COUNT(*), SUM(number_of_correct_answers),
+    SUM(number_of_correct_answers * number_of_correct_answers),
+    MIN(number_of_correct_answers), MAX(number_of_correct_answers)
+    FROM results WHERE module_id IS NOT NULL AND number_of_correct_answers IS NOT NULL GROUP BY module_id''',
+    '''INSERT INTO module_score_histogram
+    SELECT module_id, number_of_correct_answers, COUNT(*)
+    FROM results WHERE module_id IS NOT NULL AND number_of_correct_answers IS NOT NULL
+    GROUP BY module_id, number_of_correct_answers''',
+]
+
+
+def full_text_index(table, key, columns):
+    """A function to make the statements for an FTS5 index over some text columns of a table. The index is an
+    external content table, so the text is not stored twice, and the triggers keep it in step with every insert,
+    delete and change of those columns. Prefix indexes for two and three characters make prefix searches as fast as
+    whole word ones. The last statement indexes the rows which are already in the table."""
+    index = f'{table.lower()}_fts'
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({names}, content='{table}', content_rowid='{key}',
+        prefix='2 3')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index}(rowid, {names}) VALUES(new.{key}, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {names}) VALUES('delete', old.{key}, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {key}, {names} ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {names}) VALUES('delete', old.{key}, {old_values});
+            INSERT INTO {index}(rowid, {names}) VALUES(new.{key}, {new_values});
+        END""",
+        f"""INSERT INTO {index}({index}) VALUES('rebuild')""",
+    ]
+
+
+def change_counter(table, columns=None):
+    """A function to make the triggers which bump the change counter in bank_version whenever a row of a table is
+    inserted or deleted, or one of columns is changed (any column when columns is None)."""
+    name = f'{table.lower()}_bank_version'
+    bump = 'UPDATE bank_version SET version = version + 1;'
+    of = f' OF {", ".join(columns)}' if columns else ''
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} BEGIN {bump} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} BEGIN {bump} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE{of} ON {table} BEGIN {bump} END""",
+    ]
+
+
+def require_unique_module_codes(con):
+    """A function to stop the upgrade with an error naming the modules which share a code, before the unique index on
+    the module codes is made, so whoever sees it knows which modules to give a code of their own. Nothing is changed
+    for them, as the questions, reports and results of the modules would have to be merged by hand."""
+    duplicates = con.execute('''SELECT Code, GROUP_CONCAT(ID || ' ' || Name, ', ') FROM modules
+    GROUP BY Code HAVING COUNT(*) > 1 ORDER BY Code''').fetchall()
+    if duplicates:
+        listed = '; '.join(f'code {code}: modules {modules}' for code, modules in duplicates)
+        raise sqlite3.IntegrityError(f'Some modules share a module code, give each of them a code of its own, for '
+                                     f'example with UPDATE modules SET Code = ... WHERE ID = ..., and start again '
+                                     f'({listed})')
+
+
+"""Each entry is the list of statements which bring the schema from the previous version to this one, or of functions
+which are called with the connection to check the data first. The position in the list is the version number minus
+one, so migrations must only ever be appended."""
+MIGRATIONS = [
+    # 1: the tables the app has always used
+    [
+        '''CREATE TABLE IF NOT EXISTS modules
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                 Name TEXT NOT NULL,
+                 Code INTEGER NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS Questions
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                 Question TEXT NOT NULL,
+                 Type TEXT NOT NULL,
+                 Mark INTEGER NOT NULL,
+                 Module_ID INT NOT NULL,
+                 Number INTEGER DEFAULT 0,
+                 FOREIGN KEY(Module_ID) REFERENCES modules(ID))''',
+        '''CREATE TABLE IF NOT EXISTS Answers
+                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                 Answer TEXT NOT NULL,
+                 Description TEXT,
+                 Is_Right INT NOT NULL,
+                 Question_ID INT NOT NULL,
+                 FOREIGN KEY(Question_ID) REFERENCES Questions(ID))''',
+        '''CREATE TABLE IF NOT EXISTS results(
+        id INTEGER PRIMARY KEY,
+        module_id INTEGER,
+        number_of_questions integer,
+        number_of_correct_answers INTEGER,
+        time_taken TEXT
+        )''',
+    ],
+    # 2: indexes for the lookups the quiz, the admin pages and the reports make
+    [
+        'CREATE INDEX IF NOT EXISTS questions_module_id ON Questions(Module_ID)',
+        'CREATE INDEX IF NOT EXISTS questions_question ON Questions(Question)',
+        'CREATE INDEX IF NOT EXISTS answers_question_id ON Answers(Question_ID, Is_Right)',
+        'CREATE INDEX IF NOT EXISTS modules_name ON modules(Name)',
+        require_unique_module_codes,
+        'CREATE UNIQUE INDEX IF NOT EXISTS modules_code ON modules(Code)',
+        'CREATE INDEX IF NOT EXISTS results_module_id ON results(module_id, number_of_correct_answers)',
+    ],
+    # 3: running score aggregates per module, kept up to date by triggers in the same transaction as the result row
+    [
+        '''CREATE TABLE IF NOT EXISTS module_scores(
+        module_id INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL,
+        score_sum INTEGER NOT NULL,
+        score_sum_squares INTEGER NOT NULL,
+        min_score INTEGER,
+        max_score INTEGER
+        )''',
+        '''CREATE TABLE IF NOT EXISTS module_score_histogram(
+        module_id INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        attempts INTEGER NOT NULL,
+        PRIMARY KEY(module_id, score)
+        ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS results_aggregate_insert AFTER INSERT ON results
+        WHEN NEW.module_id IS NOT NULL AND NEW.number_of_correct_answers IS NOT NULL
+        BEGIN
+            INSERT INTO module_scores VALUES(NEW.module_id, 1, NEW.number_of_correct_answers,
+                NEW.number_of_correct_answers * NEW.number_of_correct_answers,
+                NEW.number_of_correct_answers, NEW.number_of_correct_answers)
+            ON CONFLICT(module_id) DO UPDATE SET attempts = attempts + 1,
+                score_sum = score_sum + excluded.score_sum,
+                score_sum_squares = score_sum_squares + excluded.score_sum_squares,
+                min_score = MIN(min_score, excluded.min_score),
+                max_score = MAX(max_score, excluded.max_score);
+            INSERT INTO module_score_histogram VALUES(NEW.module_id, NEW.number_of_correct_answers, 1)
+            ON CONFLICT(module_id, score) DO UPDATE SET attempts = attempts + 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS results_aggregate_delete AFTER DELETE ON results
+        WHEN OLD.module_id IS NOT NULL AND OLD.number_of_correct_answers IS NOT NULL
+        BEGIN
+            UPDATE module_score_histogram SET attempts = attempts - 1
+            WHERE module_id = OLD.module_id AND score = OLD.number_of_correct_answers;
+            DELETE FROM module_score_histogram WHERE module_id = OLD.module_id AND attempts <= 0;
+            UPDATE module_scores SET attempts = attempts - 1,
+                score_sum = score_sum - OLD.number_of_correct_answers,
+                score_sum_squares = score_sum_squares - OLD.number_of_correct_answers * OLD.number_of_correct_answers,
+                min_score = (SELECT MIN(score) FROM module_score_histogram WHERE module_id = OLD.module_id),
+                max_score = (SELECT MAX(score) FROM module_score_histogram WHERE module_id = OLD.module_id)
+            WHERE module_id = OLD.module_id;
+            DELETE FROM module_scores WHERE module_id = OLD.module_id AND attempts <= 0;
+        END''',
+    ] + REBUILD_AGGREGATES,
+    # 4: newest-first paging through the results for the achievements
+    [
+        'CREATE INDEX IF NOT EXISTS results_time_taken ON results(time_taken)',
+    ],
+    # 5: full text search over module names and codes, question text and answer text
+    full_text_index('modules', 'ID', ['Name', 'Code'])
+    + full_text_index('Questions', 'ID', ['Question'])
+    + full_text_index('Answers', 'ID', ['Answer']),
+    # 6: a change counter for the question cache, bumped by every change to the modules, questions and answers except
+    # the usage counter of a question, which every quiz changes
+    [
+        '''CREATE TABLE IF NOT EXISTS bank_version(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+        )''',
+        'INSERT OR IGNORE INTO bank_version VALUES(1, 0)',
+    ]
+    + change_counter('modules')
+    + change_counter('Questions', ['ID', 'Question', 'Type', 'Mark', 'Module_ID'])
+    + change_counter('Answers'),
+    # 7: keep the score aggregates right when a result is changed, by taking the old score out and putting the new one
+    # in, and rebuild them in case a result was changed before
+    [
+        '''CREATE TRIGGER IF NOT EXISTS results_aggregate_update
+        AFTER UPDATE OF module_id, number_of_correct_answers ON results
+        BEGIN
+            UPDATE module_score_histogram SET attempts = attempts - 1
+            WHERE module_id = OLD.module_id AND score = OLD.number_of_correct_answers;
+            DELETE FROM module_score_histogram WHERE module_id = OLD.module_id AND attempts <= 0;
+            UPDATE module_scores SET attempts = attempts - 1,
+                score_sum = score_sum - OLD.number_of_correct_answers,
+                score_sum_squares = score_sum_squares - OLD.number_of_correct_answers * OLD.number_of_correct_answers,
+                min_score = (SELECT MIN(score) FROM module_score_histogram WHERE module_id = OLD.module_id),
+                max_score = (SELECT MAX(score) FROM module_score_histogram WHERE module_id = OLD.module_id)
+            WHERE module_id = OLD.module_id AND OLD.number_of_correct_answers IS NOT NULL;
+            DELETE FROM module_scores WHERE module_id = OLD.module_id AND attempts <= 0;
+            INSERT INTO module_scores SELECT NEW.module_id, 1, NEW.number_of_correct_answers,
+                NEW.number_of_correct_answers * NEW.number_of_correct_answers,
+                NEW.number_of_correct_answers, NEW.number_of_correct_answers
+            WHERE NEW.module_id IS NOT NULL AND NEW.number_of_correct_answers IS NOT NULL
+            ON CONFLICT(module_id) DO UPDATE SET attempts = attempts + 1,
+                score_sum = score_sum + excluded.score_sum,
+                score_sum_squares = score_sum_squares + excluded.score_sum_squares,
+                min_score = MIN(min_score, excluded.min_score),
+                max_score = MAX(max_score, excluded.max_score);
+            INSERT INTO module_score_histogram SELECT NEW.module_id, NEW.number_of_correct_answers, 1
+            WHERE NEW.module_id IS NOT NULL AND NEW.number_of_correct_answers IS NOT NULL
+            ON CONFLICT(module_id, score) DO UPDATE SET attempts = attempts + 1;
+        END''',
+    ] + REBUILD_AGGREGATES,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(con):
+    """A function to read the schema version of the database the connection is open on"""
+    return con.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(con):
+    """A function to apply every migration the database has not had yet. The version is read again after the write
+    lock is taken, so two processes starting at the same time do not both apply the same migration."""
+    while get_version(con) < SCHEMA_VERSION:
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_version(con)
+            if version < SCHEMA_VERSION:
+                for statement in MIGRATIONS[version]:
+                    if callable(statement):
+                        statement(con)
+                    else:
+                        con.execute(statement)
+                con.execute(f'PRAGMA user_version = {version + 1}')
+            con.commit()
+        except sqlite3.IntegrityError as e:
+            con.rollback()
+            raise sqlite3.IntegrityError(f'Could not upgrade the database to schema version {version + 1}: {e}')
+        except sqlite3.Error:
+            con.rollback()
+            raise
+    return get_version(con)
@@ -1,10 +1,166 @@
-class Question:
-    def __init__(self, question, answers):
-        self.question = question
-        self.answers = answers
-
-class Answer:
-    def __init__(self, answer, description, isright):
-        self.answer = answer
-        self.description = description
-        self.isright = isright
+"""The questions and answers of a quiz. Question and Answer are small named tuples, so they can not be changed once they
+are made and can be shared by every quiz which is given them, and QuestionBank keeps every question of a module in columns of arrays and byte buffers, which is how the
+question cache holds whole modules in memory without paying for an object per question, per answer and per string."""
+import random
+import sys
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+"""Answers this short are interned, so the "True" and "False" of every True/False question and the other short
+answers repeated all over the bank are kept in memory once"""
+INTERN_LENGTH = 32
+
+
+class Answer(NamedTuple):
+    """A class for an answer to a question, isright telling whether it is a right one"""
+    answer: str
+    description: str
+    isright: bool
+    id: int = None
+
+
+class Question(NamedTuple):
+    """A class for a question with its answers, which are a tuple of Answers"""
+    question: str
+    answers: tuple
+    id: int = None
+
+
+def share(text, strings=None):
+    """A function to keep repeated text once. Short text is interned for the whole program and longer text, like the
+    description the add question forms give every answer of a question, is shared through the strings dict if one is
+    given."""
+    if text is None:
+        return None
+    if len(text) <= INTERN_LENGTH:
+        return sys.intern(text)
+    if strings is None:
+        return text
+    return strings.setdefault(text, text)
+
+
+def questions_from_rows(rows):
+    """A function to group (question ID, question, answer ID, answer, description, is right) rows, ordered by question
+    ID, into Questions. A question without answers comes as one row with the answer columns NULL. It returns a dict of
+    the questions by ID in the order of the rows."""
+    grouped = {}
+    strings = {}
+    for question_id, question, answer_id, answer, description, is_right in rows:
+        if question_id not in grouped:
+            grouped[question_id] = (question, [])
+        if answer_id is not None:
+            grouped[question_id][1].append(Answer(share(answer, strings), share(description, strings), bool(is_right),
+                                                  answer_id))
+    return {question_id: Question(question, tuple(answers), question_id)
+            for question_id, (question, answers) in grouped.items()}
+
+
+class TextColumn:
+    """A class keeping a column of strings, or None, encoded one after another in one bytearray, with the offset each
+    of them ends at in an array, so a column of thousands of strings is a few buffers instead of thousands of
+    objects"""
+    __slots__ = ('data', 'ends', 'nulls')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array('q')
+        self.nulls = bytearray()
+
+    def append(self, text):
+        if text is None:
+            self.nulls.append(1)
+        else:
+            self.nulls.append(0)
+            self.data += text.encode()
+        self.ends.append(len(self.data))
+
+    def __getitem__(self, index):
+        if self.nulls[index]:
+            return None
+        start = self.ends[index - 1] if index else 0
+        return self.data[start:self.ends[index]].decode()
+
+    def __len__(self):
+        return len(self.ends)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.data) + sys.getsizeof(self.ends) + sys.getsizeof(self.nulls)
+
+
+class QuestionBank:
+    """A class holding every question of a module in columns. The question IDs, in ascending order, are one array and
+    their texts one TextColumn; the answers of every question follow each other in the answer columns, and offsets[i]
+    to offsets[i + 1] are the answers of the question at index i. Questions are only made from the columns when they
+    are asked for, so a bank of thousands of questions costs a few arrays and buffers, and going over all of them
+    runs over contiguous memory."""
+    __slots__ = ('ids', 'texts', 'offsets', 'answer_ids', 'answers', 'descriptions', 'rights')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.texts = TextColumn()
+        self.offsets = array('q')
+        self.answer_ids = array('q')
+        self.answers = TextColumn()
+        self.descriptions = TextColumn()
+        self.rights = bytearray()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """A function to build a bank from the same rows questions_from_rows takes"""
+        bank = cls()
+        for question_id, question, answer_id, answer, description, is_right in rows:
+            if not bank.ids or bank.ids[-1] != question_id:
+                bank.ids.append(question_id)
+                bank.texts.append(question)
+                bank.offsets.append(len(bank.answer_ids))
+            if answer_id is not None:
+                bank.answer_ids.append(answer_id)
+                bank.answers.append(answer)
+                bank.descriptions.append(description)
+                bank.rights.append(1 if is_right else 0)
+        bank.offsets.append(len(bank.answer_ids))
+        return bank
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self.question(index) for index in range(len(self.ids)))
+
+    def index(self, question_id):
+        """A function to find the index of a question by its ID, raising a KeyError if it is not in the bank"""
+        index = bisect_left(self.ids, question_id)
+        if index == len(self.ids) or self.ids[index] != question_id:
+            raise KeyError(question_id)
+        return index
+
+    def question(self, index):
+        """A function to make the Question at an index, with its answers. Short answers and descriptions are interned
+        as they are decoded, so the "True" and "False" of every question asked are the same two strings."""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        answers = tuple(Answer(share(self.answers[i]), share(self.descriptions[i]), bool(self.rights[i]),
+                               self.answer_ids[i]) for i in range(start, end))
+        return Question(self.texts[index], answers, self.ids[index])
+
+    def get(self, question_id):
+        """A function to get a question by its ID, or None if it is not in the bank"""
+        try:
+            return self.question(self.index(question_id))
+        except KeyError:
+            return None
+
+    def sample(self, count, rng=random):
+        """A function to draw count different questions at random, or all of them if there are fewer"""
+        return [self.question(index) for index in rng.sample(range(len(self.ids)), min(count, len(self.ids)))]
+
+    def right_answers(self, index):
+        """A function to get the set of right answers of the question at an index, straight from the columns"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return frozenset(share(self.answers[i]) for i in range(start, end) if self.rights[i])
+
+    def nbytes(self):
+        """A function to get how many bytes the bank takes in memory"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.ids) + sys.getsizeof(self.offsets)
+                + sys.getsizeof(self.answer_ids) + sys.getsizeof(self.rights) + self.texts.nbytes()
+                + self.answers.nbytes() + self.descriptions.nbytes())
@@ -0,0 +1,107 @@
+"""An in-memory cache of the module list and of the questions and answers of every module, so starting a quiz on a
+module which was taken before, or rebuilding the modules frame, does not read them from the database again.
+
+The cache never serves anything older than the database. Migration 6 added a change counter, bank_version, which
+triggers bump in the same transaction as every insert, delete and change of a module, a question or an answer, made
+by this process or any other. Every lookup first reads the counter, a single row, and when it has moved since the
+cache was filled everything in the cache is dropped. The usage counter of a question is left out, as every finished
+quiz changes it. PRAGMA data_version is not used because it also moves for every result written, and only for
+changes made through other connections, which with the connection pool would miss changes made by this process.
+
+The questions of a module are kept as a QuestionBank, in columns, and the banks of the modules used least recently are
+evicted once their estimated size is over max_bytes."""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+import repository
+from question_answers import QuestionBank
+
+
+class QuestionCache:
+    """A class holding the cached module list and the question banks of the modules, by module name, least recently
+    used first. The cached rows and banks are shared by everyone asking for them and must not be changed."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._modules = None
+        self._questions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_version(self):
+        """A function to read the change counter and drop everything in the cache if it has moved. It returns the
+        counter, which has to be read before the rows are, so rows read for the cache are never older than it."""
+        version = repository.fetch_one('SELECT version FROM bank_version')[0]
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._modules = None
+                self._questions.clear()
+                self.size = 0
+        return version
+
+    def modules(self):
+        """A function to get the (ID, Name, Code) rows of every module, ordered by ID"""
+        version = self.check_version()
+        with self._lock:
+            if self._modules is not None:
+                self.hits += 1
+                return self._modules
+            self.misses += 1
+        rows = tuple(tuple(row) for row in repository.fetch_all('SELECT ID, Name, Code FROM modules ORDER BY ID'))
+        with self._lock:
+            if version == self._version:
+                self._modules = rows
+        return rows
+
+    def module_page(self, after, limit):
+        """A function to get the page of module rows which comes after the module ID after, like the paged
+        TreeViews ask for"""
+        rows = self.modules()
+        start = bisect_left(rows, ((after or 0) + 1,))
+        return rows[start:start + limit]
+
+    def questions(self, module):
+        """A function to get the questions of a module, with their answers, as a QuestionBank. A module without
+        questions, or which does not exist, gives an empty bank."""
+        version = self.check_version()
+        with self._lock:
+            entry = self._questions.get(module)
+            if entry is not None:
+                self._questions.move_to_end(module)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        questions = load_module_questions(module)
+        size = questions.nbytes()
+        with self._lock:
+            if version == self._version and module not in self._questions and size <= self.max_bytes:
+                self._questions[module] = (questions, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _module, (_questions, evicted) = self._questions.popitem(last=False)
+                    self.size -= evicted
+        return questions
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._modules = None
+            self._questions.clear()
+            self.size = 0
+
+
+def load_module_questions(module):
+    """A function to load every question of a module with its answers in one joined query"""
+    rows = repository.fetch_all("""SELECT q.ID, q.Question, a.ID, a.Answer, a.Description, a.Is_Right FROM Questions q
+    LEFT JOIN Answers a ON a.Question_ID = q.ID
+    WHERE q.Module_ID = (SELECT ID FROM modules WHERE Name = ?)
+    ORDER BY q.ID, a.ID""", [module])
+    return QuestionBank.from_rows(rows)
+
+
+question_cache = QuestionCache()
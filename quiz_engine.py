@@ -0,0 +1,152 @@
+"""The quiz engine. A QuizSession holds everything about one quiz being taken: the questions drawn for it, its answer
+key, which question it is at and the score so far. It does not know anything about tkinter, so the same quizzes can
+be run by the Tk frames in quiz_features, by a server or by a script without a display."""
+from random import sample
+
+import repository
+from instrumentation import timed
+from question_answers import questions_from_rows
+from question_cache import question_cache
+from sampler import question_sampler
+from write_behind import write_buffer
+
+
+class QuizSession:
+    """A class for one quiz on a module. start() draws the questions, current_question is the question to show next,
+    answer(option) grades an option for it and moves on to the next question, and finish() records the result once
+    every question has been answered. The usage counters and the result go through the write-behind buffer like
+    every other quiz write. The questions come from the question cache, or straight from the database when cache is
+    None.
+
+    The questions are drawn by the sampler, which prefers the questions asked least, draws the mix of types and marks
+    given as mix first and leaves out the questions the taker got in their last quizzes. With sampler None, or without
+    the cache, every question of the module is as likely as any other."""
+    number_of_questions = 5
+
+    def __init__(self, module, number_of_questions=None, buffer=write_buffer, cache=question_cache,
+                 sampler=question_sampler, taker=None, mix=None):
+        self.module = module
+        self.number_of_questions = number_of_questions or QuizSession.number_of_questions
+        self.buffer = buffer
+        self.cache = cache
+        self.sampler = sampler
+        self.taker = taker
+        self.mix = mix
+        self.questions = []
+        self.answer_key = {}
+        self.descriptions = []
+        self.index = 0
+        self.score = 0
+        self.finished = False
+
+    @timed('quiz.start')
+    def start(self):
+        """A function to draw the questions of the quiz and load them with their answers. It raises a ValueError if
+        the module has no questions to ask."""
+        if self.cache is not None and self.sampler is not None:
+            self.questions = self.sampler.draw(self.module, self.cache.questions(self.module), self.number_of_questions,
+                                               self.taker, self.mix)
+        elif self.cache is not None:
+            self.questions = self.cache.questions(self.module).sample(self.number_of_questions)
+        else:
+            question_ids = get_question_ids(self.module)
+            self.questions = load_questions(sample(question_ids, min(len(question_ids), self.number_of_questions)))
+        if not self.questions:
+            raise ValueError(f'The module {self.module} has no questions')
+        self.answer_key = build_answer_key(self.questions)
+        self.index = 0
+        self.score = 0
+        self.descriptions = []
+        self.finished = False
+        return self
+
+    @property
+    def current_question(self):
+        """The question to be answered next, or None once every question has been answered"""
+        if self.index < len(self.questions):
+            return self.questions[self.index]
+        return None
+
+    @property
+    def is_complete(self):
+        """Whether every question of the quiz has been answered"""
+        return self.index >= len(self.questions)
+
+    @timed('quiz.grade')
+    def grade(self, question, option):
+        """A function to grade an option against the answer key, so no database lookup is needed. It will return 1
+        if the option is correct and 0 if it is wrong. An option can also be a collection of answers, which is then
+        only correct if it is exactly the set of correct answers."""
+        correct_answers = self.answer_key[question.id]
+        if isinstance(option, str):
+            is_correct = option in correct_answers
+        else:
+            is_correct = frozenset(option) == correct_answers
+        if is_correct:
+            return 1
+        else:
+            return 0
+
+    def answer(self, option):
+        """A function to answer the current question with an option and move on to the next one. It returns the score
+        of the answer, 1 or 0."""
+        question = self.current_question
+        if question is None:
+            raise ValueError('Every question of the quiz has already been answered')
+        self.buffer.add_usage(question.id)
+        if self.sampler is not None:
+            self.sampler.record_usage(self.module, question.id)
+        score = self.grade(question, option)
+        self.score += score
+        options = {option} if isinstance(option, str) else set(option)
+        self.descriptions.append([answer.description for answer in question.answers if answer.answer in options])
+        self.index += 1
+        return score
+
+    @timed('quiz.finish')
+    def finish(self, flush=True):
+        """A function to record the result of the quiz and write it to the database together with the usage
+        counters. A caller finishing many quizzes at once can pass flush=False to leave the write to the timer of the
+        buffer, so the results of many quizzes go in one transaction. Finishing a quiz a second time does nothing. It
+        returns the score."""
+        if not self.finished:
+            if not self.is_complete:
+                raise ValueError('The quiz can not be finished before every question has been answered')
+            self.buffer.add_result(self.module, len(self.questions), self.score)
+            if flush:
+                self.buffer.flush()
+            self.finished = True
+        return self.score
+
+
+def get_question_ids(module):
+    """A function to get only the IDs of the questions in a module, so the questions for a quiz can be drawn before
+    anything else is loaded"""
+    rows = repository.fetch_all("""SELECT ID FROM Questions
+    WHERE Module_ID = (SELECT ID FROM modules WHERE Name = ?)""", [module])
+    return [row[0] for row in rows]
+
+
+def load_questions(question_ids):
+    """A function to load the drawn questions together with their answers in one joined query. The rows come back
+    ordered by question ID so the answers of a question sit next to each other and can be grouped into Question
+    objects without any further lookups. The questions are returned in the order the IDs were drawn in."""
+    if not question_ids:
+        return []
+    placeholders = ','.join('?' * len(question_ids))
+    rows = repository.fetch_all(f"""SELECT q.ID, q.Question, a.ID, a.Answer, a.Description, a.Is_Right FROM Questions q
+    LEFT JOIN Answers a ON a.Question_ID = q.ID
+    WHERE q.ID IN ({placeholders})
+    ORDER BY q.ID, a.ID""", list(question_ids))
+    questions = questions_from_rows(rows)
+    return [questions[question_id] for question_id in question_ids if question_id in questions]
+
+
+def build_answer_key(questions):
+    """A function to build the answer key of a quiz from the questions that were loaded. The key maps every question
+    ID to the set of its correct answers, so a question with more than one correct answer (the "Multiple choice" type)
+    keeps all of them."""
+    answer_key = {}
+    for question in questions:
+        answer_key[question.id] = frozenset(answer.answer for answer in question.answers if answer.isright)
+    return answer_key
@@ -1,9 +1,15 @@
-import sqlite3
-from random import sample
+import logging
 from tkinter import *
+from tkinter import messagebox
 from tkinter.ttk import Treeview
 
-from question_answers import Question, Answer
+import repository
+import startup
+from db_worker import worker
+from question_cache import question_cache
+from quiz_engine import QuizSession
+from reports import build_report, fetch_question_usage
+from tree_views import PagedTreeView
 
 
 class App(Tk):
@@ -17,55 +23,14 @@ class App(Tk):
 
     @staticmethod
     def test_modules():
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        con.commit()
-        con.close()
+        repository.fetch_one("SELECT 1")
 
     @staticmethod
     def create_db():
-        """A static method to create a database, we use if not exists in the sqlite statements so in case if the table
-        already exists the code will simply not create a new table. The tables we have used are Modules, Questions,
-        Answers and Results """
-        modules = sqlite3.connect('question_bank.db')
-        m = modules.cursor()
-        m.execute('''CREATE TABLE IF NOT EXISTS modules
-                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                 Name TEXT NOT NULL,
-                 Code INTEGER NOT NULL)''')
-        modules.commit()
-        modules.close()
-
-        questions = sqlite3.connect('question_bank.db')
-        q = questions.cursor()
-        q.execute('''CREATE TABLE IF NOT EXISTS Questions
-                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                 Question TEXT NOT NULL,
-                 Type TEXT NOT NULL,
-                 Mark INTEGER NOT NULL,
-                 Module_ID INT NOT NULL,
-                 Number INTEGER DEFAULT 0,
-                 FOREIGN KEY(Module_ID) REFERENCES modules(ID))''')
-        questions.commit()
-        questions.close()
-
-        answers = sqlite3.connect('question_bank.db')
-        a = answers.cursor()
-        a.execute('''CREATE TABLE IF NOT EXISTS Answers
-                 (ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                 Answer TEXT NOT NULL,
-                 Description TEXT,
-                 Is_Right INT NOT NULL,
-                 Question_ID INT NOT NULL,
-                 FOREIGN KEY(Question_ID) REFERENCES Questions(ID))''')
-        answers.commit()
-        answers.execute("""CREATE TABLE results(
-        id INTEGER PRIMARY KEY,
-        module_id INTEGER,
-        number_of_questions integer,
-        number_of_correct_answers INTEGER,
-        time_taken TEXT                                                 
-        )""")
+        """A static method to create the database or upgrade an existing one. The tables we have used are Modules,
+        Questions, Answers and Results, and they are created together with their indexes by the versioned migrations
+        in the migrations module, so running this on a database which is already up to date changes nothing."""
+        repository.migrate()
 
 
 class Receptor:
@@ -103,9 +68,11 @@ class Modules(Frame):
 
     def __init__(self, master):
         Frame.__init__(self, master)
-        self.tree = Treeview(self, columns=['name'], show='headings')
-        self.tree.pack(fill=X, expand=True)
+        self.module_tree = PagedTreeView(self, ['name', 'id'], Modules.fetch_modules, key_column=1)
+        self.tree = self.module_tree.tree
+        self.module_tree.pack(fill=X, expand=True)
         self.tree.heading('name', text='Module Name')
+        self.tree['displaycolumns'] = ('name',)
         self.insert_modules()
         self.btn = Button(self, text="Achievement", command=self.navigate)
         self.btn.pack()
@@ -118,12 +85,8 @@ class Modules(Frame):
     def report(self):
         """A function to configure the report toplevel"""
         report_toplevel = Toplevel(self)
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        self.selected_module = (self.tree.item(self.tree.focus())['values'][0])
-        query = cur.execute('''SELECT ID FROM modules where Name = ?''', (self.selected_module,))
-        self.selected_module_id = query.fetchone()
-        receptor.id_m = self.selected_module_id[0]
+        self.selected_module, self.selected_module_id = self.tree.item(self.tree.focus())['values']
+        receptor.id_m = self.selected_module_id
         Report(report_toplevel).mainloop()
         self.pack_forget()
 
@@ -148,111 +111,81 @@ class Modules(Frame):
         return item
 
     def insert_modules(self):
-        """A function to fill the TreeView with rows from our database"""
-        modules = Modules.get_modules()
-        for module in modules:
-            self.tree.insert('', END, values=module)
+        """A function to fill the TreeView with the first page of rows from our database, the TreeView fetches the
+        next pages itself when it is scrolled"""
+        self.module_tree.refresh()
+
+    @staticmethod
+    def fetch_modules(after, limit):
+        """A function to get the page of modules which comes after the module ID after, from the question cache"""
+        return [(name, module_id) for module_id, name, _code in question_cache.module_page(after, limit)]
 
     @staticmethod
     def get_modules():
-        """A function to get the modules from the database and return them """
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("SELECT Name FROM modules")
-        con.commit()
-        modules = cur.fetchall()
-        con.close()
-        return modules
+        """A function to get the modules from the question cache and return them """
+        return [(name,) for _module_id, name, _code in question_cache.modules()]
 
 
 class Quiz(Frame):
     """A frame class for the quiz which runs after a module is selected and the user clicks on "Take", this class
     displays random 5 questions out of the database and the answers relevant to it. After the quiz is finished it will
-    also show the score achieved. This class inherits from the tkinter object Frame. """
+    also show the score achieved. The quiz itself is run by a QuizSession from the quiz engine, this frame only shows
+    its questions one at a time. The app has one user, the taker, so the questions of their last quizzes are not asked
+    again straight away. This class inherits from the tkinter object Frame. """
+    number_of_questions = 5
+    taker = 'desktop'
+
     def __init__(self, master, module):
         Frame.__init__(self, master)
         self.master = master
         self.module = module
         self.master.title(self.module)
 
-        self.descriptions = []
-        self.questions = []
-        self.index = 0
-        self.result = 0
+        self.session = QuizSession(self.module, Quiz.number_of_questions, taker=Quiz.taker)
+        self.page = Label(self, text="Loading the questions...")
+        self.page.pack()
+        worker.submit(self, self.session.start, on_done=self.show_first_question, on_error=self.start_failed)
 
-        for question in self.get_questions():
-            ques = self.get_questions_as_objects(question)
-            self.questions.append(ques)
-        self.questions = sample(self.questions, 5)
-        self.page = InsideQuiz(self, self.questions[self.index], self.module)
+    def show_first_question(self, session):
+        """A function to show the first question once the database worker has drawn and loaded the questions"""
+        self.page.destroy()
+        self.page = InsideQuiz(self, session.current_question, self.module)
         self.page.pack()
 
-    def get_questions(self):
-        """A function to get the questions from the database and return it"""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("""SELECT Question FROM questions WHERE module_id=(SELECT ID FROM modules WHERE name=?)""",
-                    [self.module])
-        con.commit()
-        questions = cur.fetchall()
-        con.close()
-        return questions
-
-    def get_questions_as_objects(self, question):
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("""SELECT Answer, description, Is_Right FROM Answers WHERE question_id=
-        (SELECT id FROM questions WHERE question=?)""", question)
-        con.commit()
-        answers = []
-        results = cur.fetchall()
-
-        for result in results:
-            ans = Answer(result[0], result[1], result[2])
-            answers.append(ans)
-        con.close()
-
-        return Question(question, answers)
-
-    def grade(self, quest, option):
-        """A function to grade the quiz the user takes. It will return 1 if the option selected by user is correct and 0 if the answer is wrong."""
-        correct_answer_list = []
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        query = cur.execute('''SELECT ID FROM questions WHERE Question = ?''',
-                            (quest,))
-        self.question_id = query.fetchone()
-        query = cur.execute('''SELECT Answer FROM answers WHERE Question_ID = ? AND Is_Right = 1''',
-                            (self.question_id[0],))
-        correct_answers = query.fetchall()
-        for i in range(len(correct_answers)):
-            correct_answer_list.append(correct_answers[i][0])
-        if option in correct_answer_list:
-            return 1
-        else:
-            return 0
+    def start_failed(self, error):
+        """A function to show why the quiz could not be started, like a module without questions, and go back to the
+        main modules page"""
+        worker.show_error(error)
+        Modules(receptor.root).pack(fill=X, expand=True)
+        self.pack_forget()
 
-    def next(self, quest, option, is_right, desc):
+    def next(self, question, option, is_right, desc):
         """A function to simply switch to the next question"""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute('''UPDATE Questions SET Number = Number + 1 WHERE Question = ?''', (quest,))
-        con.commit()
-        print(self.grade(quest, option))
-        self.result += self.grade(quest, option)
-        self.descriptions.append(desc)
-        if self.index == len(self.questions) - 1:
+        self.session.answer(option)
+        if self.session.is_complete:
             self.go_to_result_page()
         else:
-            print(is_right)
             self.page.destroy()
-            self.index += 1
-            self.page = InsideQuiz(self, self.questions[self.index], self.module)
+            self.page = InsideQuiz(self, self.session.current_question, self.module)
             self.page.pack()
 
     def go_to_result_page(self):
-        """A function to switch the frame to the results frame where the score achieved would be displayed"""
-        page = Result(receptor.root, self.result, len(self.questions), self.module)
+        """A function to finish the quiz and switch the frame to the results frame where the score achieved would be
+        displayed. The result is written on the database worker."""
+        worker.submit(self, self.session.finish, on_done=self.show_result, on_error=self.finish_failed)
+
+    def finish_failed(self, error):
+        """A function to ask what to do when the result could not be written. The session is kept, so the result can
+        be written again, or dropped on purpose by going back to the main modules page."""
+        logging.error(error)
+        if messagebox.askretrycancel(title="Error", message=f"The result could not be saved: {error}"):
+            self.go_to_result_page()
+        else:
+            Modules(receptor.root).pack(fill=X, expand=True)
+            self.pack_forget()
+
+    def show_result(self, score):
+        page = Result(receptor.root, score, len(self.session.questions), self.module)
         page.pack()
         self.pack_forget()
 
@@ -260,52 +193,73 @@ class Quiz(Frame):
 class Report(Frame):
     """A frame class to display the report information for the selected module which would display a treeview with
     the questions and the number of times the question was asked in a quiz. It also displays the max score,
-    lowest score and the average score achieved. """
+    lowest score, the average score and the spread of the scores achieved. The numbers come from the report engine in
+    the reports module, this frame only displays them. """
     def __init__(self, master):
         Frame.__init__(self, master)
         self.master = master
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        self.tree = Treeview(master, columns=['question', 'number'], show='headings')
+        self.question_tree = PagedTreeView(master, ['question', 'number', 'id'], self.fetch_question_usage,
+                                           key_column=2)
+        self.tree = self.question_tree.tree
         self.tree.heading('question', text='Question')
         self.tree.heading('number', text='Number of times asked')
-        self.tree.pack()
+        self.tree['displaycolumns'] = ('question', 'number')
+        self.question_tree.pack()
         self.btn1 = Button(master, text="Back", command=self.back)
         self.btn1.pack()
-        max_score_query = cur.execute('''SELECT MAX(number_of_correct_answers) FROM results WHERE Module_ID=?''',
-                                      (receptor.id_m,))
-        max_score = max_score_query.fetchone()[0]
-        low_score_query = cur.execute('''SELECT MIN(number_of_correct_answers) FROM results WHERE Module_ID=?''',
-                                      (receptor.id_m,))
-        low_score = low_score_query.fetchone()[0]
-        print(max_score)
-        print(low_score)
-        try:
-            avg_score = (max_score + low_score) / 2
-        except:
-            avg_score = low_score
-
-        self.max_score_label = Label(master, text=f'The highest score achieved for selected module: {max_score}')
+        self.module_id = receptor.id_m
+        self.report = None
+
+        self.attempts_label = Label(master, text='Loading the report...')
+        self.attempts_label.pack()
+        self.max_score_label = Label(master)
         self.max_score_label.pack()
-        self.low_score_label = Label(master, text=f'The lowest score achieved for selected module: {low_score}')
+        self.low_score_label = Label(master)
         self.low_score_label.pack()
-        self.average_score_label = Label(master, text=f'The average score achieved for selected module: {avg_score}')
+        self.average_score_label = Label(master)
         self.average_score_label.pack()
+        self.median_score_label = Label(master)
+        self.median_score_label.pack()
+        self.deviation_label = Label(master)
+        self.deviation_label.pack()
+        self.percentiles_label = Label(master)
+        self.percentiles_label.pack()
+        worker.submit(self, build_report, self.module_id, False, on_done=self.show_report)
         self.update_tree()
 
+    def show_report(self, report):
+        """A function to display the statistics of the report once the database worker has built it"""
+        self.report = report
+        self.attempts_label.configure(text=f'The number of times the module was taken: {report.count}')
+        self.max_score_label.configure(text=f'The highest score achieved for selected module: {report.max_score}')
+        self.low_score_label.configure(text=f'The lowest score achieved for selected module: {report.min_score}')
+        self.average_score_label.configure(text=f'The average score achieved for selected module: '
+                                                f'{Report.format_score(report.mean)}')
+        self.median_score_label.configure(text=f'The median score achieved for selected module: '
+                                               f'{Report.format_score(report.median)}')
+        self.deviation_label.configure(text=f'The standard deviation of the scores: '
+                                            f'{Report.format_score(report.standard_deviation)}')
+        percentiles = ', '.join(f'{p}th: {Report.format_score(score)}' for p, score in report.percentiles.items())
+        self.percentiles_label.configure(text=f'The score percentiles: {percentiles or None}')
+
+    @staticmethod
+    def format_score(score):
+        """A function to show a score with at most two decimals"""
+        if score is None:
+            return score
+        return round(score, 2)
+
     def back(self):
         """A function to destroy the report TopLevel"""
         self.master.destroy()
 
     def update_tree(self):
-        """A function to populate the TreeView with columns from database"""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        self.tree.delete(*self.tree.get_children())
-        cur.execute('''SELECT Question,Number FROM Questions WHERE MODULE_ID=(?)''', (receptor.id_m,))
-        rows = cur.fetchall()
-        for row in rows:
-            self.tree.insert("", END, values=row)
+        """A function to populate the TreeView with the first page of the question usage of the module"""
+        self.question_tree.refresh()
+
+    def fetch_question_usage(self, after, limit):
+        """A function to get the page of question usage which comes after the question ID after"""
+        return fetch_question_usage(self.module_id, after, limit)
 
 
 class InsideQuiz(Frame):
@@ -316,25 +270,18 @@ class InsideQuiz(Frame):
         self.master = master
         self.question = question
 
-        # To replace {} brackets
-        quest = question.question[0]
-        quest = quest.replace('{', '')
-        quest = quest.replace('}', '')
-
-        lbl = Label(self, text=quest)
+        lbl = Label(self, text=question.question)
         lbl.pack()
 
         for answer in question.answers:
             self.mybutton = Button(self, text=answer.answer,
-                                   command=lambda button_text=answer.answer: self.next(quest, button_text,
-                                                                                       answer.isright,
-                                                                                       answer.description))
+                                   command=lambda button_text=answer.answer, is_right=answer.isright,
+                                   desc=answer.description: self.next(button_text, is_right, desc))
             self.mybutton.pack()
 
-    def next(self, quest, button_text, is_right, desc):
+    def next(self, button_text, is_right, desc):
         """A function to go the next question"""
-        print(button_text)
-        self.master.next(quest, button_text, is_right, desc)
+        self.master.next(self.question, button_text, is_right, desc)
         self.pack_forget()
 
 
@@ -351,7 +298,6 @@ class Result(Frame):
 
         exit_btn = Button(self, text='Exit', command=self.exit)
         exit_btn.pack()
-        Result.insert_result(self.module, number_of_questions, results)
 
     def exit(self):
         """A function to exit the results and go back to the main modules page"""
@@ -359,22 +305,13 @@ class Result(Frame):
         module.pack(fill=X, expand=True)
         self.pack_forget()
 
-    @staticmethod
-    def insert_result(module, number_of_questions, number_of_correct_answers):
-        """A function to push the results into the database."""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("INSERT INTO results(module_id, number_of_questions, number_of_correct_answers, time_taken) VALUES("
-                    ""
-                    "(SELECT id FROM modules WHERE name=?),?,?, DATETIME('now', 'localtime'))",
-                    [module, number_of_questions, number_of_correct_answers])
-        con.commit()
-        con.close()
-
 
 class Achievements(Frame):
     """A frame class to display the Achievements of the user which contains the previous score achieved, the date and
-    time the quiz was taken on and the module name """
+    time the quiz was taken on and the module name. The newest results are shown first, one page at a time, and the
+    next page is only fetched when the user asks for more, so the frame opens just as fast for a long history."""
+    page_size = 50
+
     def __init__(self, master):
         Frame.__init__(self, master)
         self.master = master
@@ -384,41 +321,53 @@ class Achievements(Frame):
         self.tree.heading('module', text='Module')
         self.tree.pack()
 
-        for result in Achievements.get_results():
-            module = result[0]
-            module = Achievements.get_module_from_id(module)
-            carry = "{} of {}".format(result[2], result[1])
-            self.tree.insert('', END, values=[carry, result[3], module])
+        self.last_result = None
+        self.load_more_btn = Button(self, text="Load more", command=self.load_page)
+        self.load_more_btn.pack()
+        self.load_page()
         go_back_btn = Button(self, text="Go Back", command=self.go_back)
         go_back_btn.pack()
 
+    def load_page(self):
+        """A function to add the next page of results to the TreeView. The button to load more is disabled once the
+        last page has been shown. The results are fetched by the database worker and added by add_page."""
+        self.load_more_btn.configure(state=DISABLED)
+        worker.submit(self, Achievements.get_results, self.last_result, Achievements.page_size,
+                      on_done=self.add_page)
+
+    def add_page(self, results):
+        """A function to add a page of results fetched by load_page to the TreeView"""
+        for _module_id, number_of_questions, number_of_correct_answers, time_taken, _result_id, module in results:
+            carry = "{} of {}".format(number_of_correct_answers, number_of_questions)
+            self.tree.insert('', END, values=[carry, time_taken, module])
+        if results:
+            self.last_result = (results[-1][3], results[-1][4])
+        if len(results) == Achievements.page_size:
+            self.load_more_btn.configure(state=NORMAL)
+
     def go_back(self):
         """A function to go back to the main modules page"""
         Modules(receptor.root).pack(fill=X, expand=True)
         self.pack_forget()
 
     @staticmethod
-    def get_results():
-        """A function to fetch the results from the database and return them"""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("SELECT module_id, number_of_questions, number_of_correct_answers, time_taken FROM results")
-        results = cur.fetchall()
-        con.commit()
-        con.close()
-        return results
+    def get_results(after=None, limit=-1):
+        """A function to fetch the results, newest first, together with the name of their module in one joined query
+        and return them. A page starts after the (time_taken, id) of the last result of the previous page, so the
+        database can seek straight to it with the time_taken index instead of skipping over the earlier pages."""
+        if after is None:
+            return repository.fetch_all("""SELECT r.module_id, r.number_of_questions, r.number_of_correct_answers,
+            r.time_taken, r.id, m.Name FROM results r LEFT JOIN modules m ON m.ID = r.module_id
+            ORDER BY r.time_taken DESC, r.id DESC LIMIT ?""", (limit,))
+        return repository.fetch_all("""SELECT r.module_id, r.number_of_questions, r.number_of_correct_answers,
+        r.time_taken, r.id, m.Name FROM results r LEFT JOIN modules m ON m.ID = r.module_id
+        WHERE (r.time_taken, r.id) < (?, ?)
+        ORDER BY r.time_taken DESC, r.id DESC LIMIT ?""", (*after, limit))
 
     @staticmethod
     def get_module_from_id(module_id):
-        """"""
-        con = sqlite3.connect('question_bank.db')
-        cur = con.cursor()
-        cur.execute("SELECT name FROM modules WHERE id=?", [module_id])
-        name = cur.fetchone()
-        name = name[0]
-        con.commit()
-        con.close()
-        return name
+        """A function to get the name of a module from its id"""
+        return repository.fetch_one("SELECT name FROM modules WHERE id=?", [module_id])[0]
 
 
 class Launch:
@@ -426,6 +375,7 @@ class Launch:
     def launch(self):
         root = App()
         receptor.root = root
+        startup.ready(root, 'quiz')
         mainloop()
 
 
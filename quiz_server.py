@@ -0,0 +1,255 @@
+"""An HTTP server which serves quizzes as JSON from the same question_bank.db the admin tool edits. It only needs the
+standard library: requests are read with asyncio streams, the quizzes are QuizSessions from the quiz engine kept in
+memory, and everything that touches SQLite runs in a small thread pool so the event loop never waits on the database.
+
+    python quiz_server.py --port 8080
+
+The endpoints are:
+
+    GET  /modules                  the modules, as [{"id": 1, "name": "Math", "code": 1179}, ...]
+    POST /quiz                     start a quiz, the body is {"module": "Math"}, optionally with "taker": "<name>" so
+                                   the questions of the last quizzes of that taker are not asked again
+    POST /quiz/<session>/answer    answer the current question, the body is {"answer": "4"} or {"answer": ["a", "b"]}
+    POST /quiz/<session>/finish    record the result of a quiz whose questions have all been answered
+
+Starting a quiz and answering a question both reply with the next question to show, without its right answers."""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import repository
+from question_cache import question_cache
+from quiz_engine import QuizSession
+
+MAX_BODY = 64 * 1024
+SESSION_TIMEOUT = 30 * 60
+
+
+class HTTPError(Exception):
+    """An exception which is turned into an error reply with its status and message"""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+        self.message = message
+
+
+class QuizServer:
+    """A class holding the quiz sessions in progress and answering the requests for them. A session is forgotten
+    once it is finished or when it has not been used for SESSION_TIMEOUT seconds."""
+
+    def __init__(self, workers=None, session_timeout=SESSION_TIMEOUT):
+        self.executor = ThreadPoolExecutor(max_workers=workers or repository.pool.size,
+                                           thread_name_prefix='quiz-db')
+        self.session_timeout = session_timeout
+        self.sessions = {}
+
+    async def run_in_pool(self, function, *args):
+        """A function to run a blocking database function in the thread pool and wait for it"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def dispatch(self, method, path, body):
+        """A function to route a request to its handler. It returns the status and the JSON payload of the reply."""
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        if parts == ['modules']:
+            self.require(method, 'GET')
+            return HTTPStatus.OK, await self.run_in_pool(self.list_modules)
+        if parts == ['quiz']:
+            self.require(method, 'POST')
+            return HTTPStatus.CREATED, await self.start_quiz(self.parse(body))
+        if len(parts) == 3 and parts[0] == 'quiz' and parts[2] in ('answer', 'finish'):
+            self.require(method, 'POST')
+            if parts[2] == 'answer':
+                return HTTPStatus.OK, self.answer(parts[1], self.parse(body))
+            return HTTPStatus.OK, await self.finish(parts[1])
+        raise HTTPError(HTTPStatus.NOT_FOUND, f'There is nothing at {path}')
+
+    @staticmethod
+    def require(method, expected):
+        if method != expected:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'Use {expected} here')
+
+    @staticmethod
+    def parse(body):
+        """A function to read the JSON object sent with a request"""
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'The body is not valid JSON')
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'The body should be a JSON object')
+        return data
+
+    @staticmethod
+    def list_modules():
+        return [{'id': module_id, 'name': name, 'code': code} for module_id, name, code in question_cache.modules()]
+
+    async def start_quiz(self, data):
+        module = data.get('module')
+        if not isinstance(module, str) or not module:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Give the name of the module to take as "module"')
+        taker = data.get('taker')
+        if taker is not None and not isinstance(taker, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, '"taker" should be a string')
+        try:
+            session = await self.run_in_pool(QuizSession(module, taker=taker).start)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.NOT_FOUND, str(e))
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = [session, time.monotonic()]
+        return {'session': session_id, 'number_of_questions': len(session.questions),
+                'question': QuizServer.show_question(session)}
+
+    def get_session(self, session_id):
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'There is no quiz with this session, it may have expired')
+        entry[1] = time.monotonic()
+        return entry[0]
+
+    def answer(self, session_id, data):
+        """A function to grade an answer. Grading only uses the answer key in memory, so it is done right on the
+        event loop."""
+        session = self.get_session(session_id)
+        option = data.get('answer')
+        if not isinstance(option, (str, list)) or isinstance(option, list) and not all(
+                isinstance(value, str) for value in option):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Give the answer as a string or a list of strings as "answer"')
+        try:
+            score = session.answer(option)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.CONFLICT, str(e))
+        return {'correct': bool(score), 'score': session.score, 'complete': session.is_complete,
+                'description': session.descriptions[-1], 'question': QuizServer.show_question(session)}
+
+    async def finish(self, session_id):
+        """A function to record the result of a quiz. The write is left to the timer of the write-behind buffer, so
+        the results of all the quizzes finished in the meantime go in one transaction."""
+        session = self.get_session(session_id)
+        try:
+            score = await self.run_in_pool(session.finish, False)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.CONFLICT, str(e))
+        self.sessions.pop(session_id, None)
+        return {'score': score, 'number_of_questions': len(session.questions)}
+
+    @staticmethod
+    def show_question(session):
+        """A function to describe the current question of a session without giving away which answers are right"""
+        question = session.current_question
+        if question is None:
+            return None
+        return {'id': question.id, 'text': question.question,
+                'answers': [answer.answer for answer in question.answers], 'number': session.index + 1}
+
+    async def expire_sessions(self):
+        """A function which runs for as long as the server does and forgets the sessions nobody has used for a while"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.session_timeout
+            for session_id, (_session, last_used) in list(self.sessions.items()):
+                if last_used < cutoff:
+                    del self.sessions[session_id]
+
+    async def handle(self, reader, writer):
+        """A function to serve the requests of one connection. Connections are kept alive between requests unless the
+        client asks to close them. A request which fails with anything but an HTTPError, like a locked database, is
+        logged and answered with a 500."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.reply(writer, HTTPStatus.BAD_REQUEST, {'error': 'Malformed request line'}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.reply(writer, HTTPStatus.BAD_REQUEST, {'error': 'Malformed Content-Length'}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.reply(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'The body is too large'},
+                                     False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                except Exception:
+                    logging.exception('%s %s failed', method, target)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Internal server error'}
+                await self.reply(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def reply(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                     f'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\n'
+                     f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        """A function to serve until the process is interrupted or terminated. Stopping the server lets the program
+        exit normally, so the write-behind buffer still writes the results of the last quizzes."""
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        expiry = asyncio.create_task(self.expire_sessions())
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, server.close)
+            except (NotImplementedError, RuntimeError):
+                pass
+        print(f'Serving quizzes on http://{host}:{port}')
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            expiry.cancel()
+            self.executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve quizzes over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, help='the number of threads for the database, by default the size of '
+                                                    'the connection pool')
+    arguments = parser.parse_args(argv)
+    try:
+        asyncio.run(QuizServer(arguments.workers).serve(arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
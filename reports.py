@@ -0,0 +1,108 @@
+"""The report engine for the module reports. The statistics of a module are worked out from its running score
+aggregates and its score histogram, which triggers on the results table keep up to date every time a result is
+inserted, changed or deleted. Scores are small whole numbers, so the histogram only has a handful of rows however many
+results there are, and building a report costs the same for a module taken twice as for one taken a million times.
+
+Running this module with --rebuild recomputes the aggregates of every module from the results table."""
+import math
+
+import migrations
+import repository
+from instrumentation import timed
+
+
+class ModuleReport:
+    """A plain result object holding the statistics of a module. The Report frame only has to display these values.
+    The histogram is a list of (score, attempts) pairs sorted by score and question_usage is a list of (question,
+    number of times asked) pairs. When the running totals (attempts, sum, sum of squares, min, max) are given the
+    mean and the standard deviation come from them, otherwise from the histogram. All the score statistics are None
+    when the module has no results yet."""
+
+    def __init__(self, module_id, histogram, question_usage, totals=None):
+        self.module_id = module_id
+        self.histogram = histogram
+        self.question_usage = question_usage
+        self.count = sum(attempts for _score, attempts in histogram)
+
+        if self.count == 0:
+            self.max_score = self.min_score = self.mean = self.median = self.standard_deviation = None
+            self.percentiles = {}
+            return
+
+        if totals is not None:
+            attempts, score_sum, score_sum_squares, self.min_score, self.max_score = totals
+            self.mean = score_sum / attempts
+            variance = max(score_sum_squares / attempts - self.mean ** 2, 0)
+        else:
+            self.min_score = histogram[0][0]
+            self.max_score = histogram[-1][0]
+            self.mean = sum(score * attempts for score, attempts in histogram) / self.count
+            variance = sum(attempts * (score - self.mean) ** 2 for score, attempts in histogram) / self.count
+        self.standard_deviation = math.sqrt(variance)
+        self.percentiles = {p: self.percentile(p) for p in (25, 50, 75, 90)}
+        self.median = self.percentiles[50]
+
+    def score_at(self, rank):
+        """A function to get the score at a position in the sorted list of all scores, without building the list"""
+        seen = 0
+        for score, attempts in self.histogram:
+            seen += attempts
+            if rank < seen:
+                return score
+        return self.histogram[-1][0]
+
+    def percentile(self, p):
+        """A function to get the p-th percentile of the scores. Between two scores the value is interpolated, the same
+        way the inclusive method of the statistics module does it."""
+        if self.count == 0:
+            return None
+        position = (self.count - 1) * p / 100
+        lower = math.floor(position)
+        lower_score = self.score_at(lower)
+        if lower == position:
+            return lower_score
+        return lower_score + (self.score_at(lower + 1) - lower_score) * (position - lower)
+
+
+@timed('report.build')
+def build_report(module_id, with_usage=True):
+    """A function to build the report of a module from its maintained score aggregates and the number of times each
+    of its questions was asked. The question usage can be left out when it is going to be fetched page by page with
+    fetch_question_usage instead."""
+    totals = repository.fetch_one('''SELECT attempts, score_sum, score_sum_squares, min_score, max_score
+    FROM module_scores WHERE module_id = ?''', (module_id,))
+    histogram = repository.fetch_all('''SELECT score, attempts FROM module_score_histogram WHERE module_id = ?
+    ORDER BY score''', (module_id,))
+    question_usage = []
+    if with_usage:
+        question_usage = repository.fetch_all('''SELECT Question, Number FROM Questions WHERE Module_ID = ?''',
+                                              (module_id,))
+    return ModuleReport(module_id, histogram, question_usage, totals)
+
+
+def fetch_question_usage(module_id, after, limit):
+    """A function to fetch one page of (question, number of times asked, question ID) rows of a module, starting
+    after the question ID after"""
+    return repository.fetch_all('''SELECT Question, Number, ID FROM Questions WHERE Module_ID = ? AND ID > ?
+    ORDER BY ID LIMIT ?''', (module_id, after or 0, limit))
+
+
+def rebuild_aggregates():
+    """A function to recompute the score aggregates of every module from the results table, for example after the
+    aggregates were changed by hand"""
+    with repository.transaction() as con:
+        for statement in migrations.REBUILD_AGGREGATES:
+            con.execute(statement)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Module reports of the question bank')
+    parser.add_argument('--rebuild', action='store_true', help='recompute the score aggregates of every module')
+    arguments = parser.parse_args()
+    if arguments.rebuild:
+        rebuild_aggregates()
+        print('The score aggregates have been rebuilt')
+    else:
+        parser.print_help()
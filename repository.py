@@ -0,0 +1,262 @@
+"""The data-access layer shared by the quiz features and the administrative features. It owns a small pool of SQLite
+connections to the question bank so that the rest of the code never has to open and close a connection of its own.
+
+Every connection in the pool is opened once, switched to WAL mode so that readers and a writer do not block each
+other, and kept open so that SQLite can reuse the statements it has already prepared on it.
+
+The writes the administrative features make go through the functions at the bottom of this module, which announce
+every changed row on the events object so the TreeViews can patch just that row."""
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import migrations
+
+DATABASE = 'question_bank.db'
+
+"""The pragmas which are run on every new connection. WAL lets the quiz read while the admin writes, NORMAL
+synchronous is safe in WAL mode and avoids a sync on every commit, and the cache and temp store keep the hot pages
+and sort buffers in memory."""
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+)
+
+
+class ConnectionPool:
+    """A class which hands out reusable connections to the database. Connections are only opened when they are
+    first needed and at most size of them are open at the same time; a caller that finds all of them busy waits for
+    one to be given back. Waiting callers are served first in, first out, and a new caller never takes a connection
+    ahead of one that is already waiting, so a caller cannot be starved while the others keep the pool busy. The
+    first connection the pool opens also brings the schema up to date. New connections are made with factory, which
+    the instrumentation module swaps for a connection class that times every query."""
+
+    def __init__(self, database, size=4, timeout=10, cached_statements=256, factory=sqlite3.Connection):
+        self.database = database
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._waiters = deque()
+        self._opened = 0
+        self._migrated = False
+        self._condition = threading.Condition()
+
+    def _connect(self):
+        """A function to open a new connection and tune it with our pragmas"""
+        con = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                              cached_statements=self.cached_statements, factory=self.factory)
+        for pragma in PRAGMAS:
+            con.execute(pragma)
+        if not self._migrated:
+            migrations.migrate(con)
+            self._migrated = True
+        return con
+
+    def _take(self):
+        """A function to take an idle connection, or the right to open a new one, while holding the condition. It
+        returns the connection, True to open a new one, or None if neither is free."""
+        if self._idle:
+            return self._idle.pop()
+        if self._opened < self.size:
+            self._opened += 1
+            return True
+        return None
+
+    def acquire(self):
+        """A function to take a connection out of the pool, opening a new one if the pool is not full yet"""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            taken = None if self._waiters else self._take()
+            if taken is None:
+                ticket = object()
+                self._waiters.append(ticket)
+                try:
+                    while True:
+                        if self._waiters[0] is ticket:
+                            taken = self._take()
+                            if taken is not None:
+                                break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise sqlite3.OperationalError('timed out waiting for a free database connection')
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiters.remove(ticket)
+                    self._condition.notify_all()
+        if taken is not True:
+            return taken
+        try:
+            return self._connect()
+        except sqlite3.Error:
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify_all()
+            raise
+
+    def release(self, con):
+        """A function to give a connection back to the pool. Anything left uncommitted on it is rolled back so the
+        next user starts from a clean connection."""
+        if con.in_transaction:
+            con.rollback()
+        with self._condition:
+            self._idle.append(con)
+            self._condition.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """A context manager to borrow a connection from the pool for the length of a with block"""
+        con = self.acquire()
+        try:
+            yield con
+        finally:
+            self.release(con)
+
+    def close(self):
+        """A function to close every idle connection in the pool"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._condition.notify_all()
+        for con in idle:
+            con.close()
+
+
+pool = ConnectionPool(DATABASE)
+
+
+def migrate():
+    """A function to bring the schema of the database up to date and return the version it is at"""
+    with pool.connection() as con:
+        return migrations.migrate(con)
+
+
+def fetch_all(sql, parameters=()):
+    """A function to run a query on a pooled connection and return all of its rows"""
+    with pool.connection() as con:
+        return con.execute(sql, parameters).fetchall()
+
+
+def fetch_one(sql, parameters=()):
+    """A function to run a query on a pooled connection and return its first row"""
+    with pool.connection() as con:
+        return con.execute(sql, parameters).fetchone()
+
+
+def execute(sql, parameters=()):
+    """A function to run a single statement which changes the database and commit it. The cursor is returned so the
+    caller can read lastrowid or rowcount."""
+    with transaction() as con:
+        return con.execute(sql, parameters)
+
+
+@contextmanager
+def transaction():
+    """A context manager which gives a pooled connection and commits everything done with it at the end of the with
+    block, or rolls it all back if an exception is raised inside it."""
+    with pool.connection() as con:
+        with con:
+            yield con
+
+
+class ChangeEvents:
+    """A class to tell the rest of the app which rows the admin data layer has changed. Listeners subscribe to a
+    table and are called with the action ('insert', 'update' or 'delete') and the ID of the row after the change has
+    been committed, so they can patch what they show instead of reloading the whole table."""
+
+    def __init__(self):
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, table, listener):
+        """A function to start calling listener(action, row_id) for every change to a table"""
+        with self._lock:
+            self._listeners.setdefault(table, []).append(listener)
+
+    def unsubscribe(self, table, listener):
+        """A function to stop calling a listener"""
+        with self._lock:
+            if listener in self._listeners.get(table, []):
+                self._listeners[table].remove(listener)
+
+    def emit(self, table, action, row_id):
+        """A function to call every listener of a table about a change to one of its rows"""
+        with self._lock:
+            listeners = list(self._listeners.get(table, []))
+        for listener in listeners:
+            listener(action, row_id)
+
+
+events = ChangeEvents()
+
+
+def add_module(name, code):
+    """A function to add a module and return its ID"""
+    module_id = execute('''INSERT INTO Modules(Name,Code) VALUES(?,?)''', (name, code)).lastrowid
+    events.emit('modules', 'insert', module_id)
+    return module_id
+
+
+def update_module(module_id, name, code):
+    """A function to change the name and code of a module"""
+    execute('''UPDATE Modules SET name = ? , code = ? WHERE ID = ?''', (name, code, module_id))
+    events.emit('modules', 'update', module_id)
+
+
+def delete_module(module_id):
+    """A function to delete a module together with its questions"""
+    with transaction() as con:
+        con.execute('''DELETE FROM Modules WHERE ID=(?)''', (module_id,))
+        con.execute('''DELETE FROM Questions WHERE Module_ID=(?)''', (module_id,))
+    events.emit('modules', 'delete', module_id)
+
+
+def create_question_with_answers(question_text, mark, question_type, module_id, answers):
+    """A function to add a question together with all of its answers in one transaction and return the ID of the
+    question. answers is a list of (answer, is_right, description) tuples. The answers are attached to the ID SQLite
+    gave the new question, not to whatever the highest question ID is, so two admins adding questions at the same
+    time can never mix their answers up, and either everything is saved or nothing is."""
+    with transaction() as con:
+        question_id = con.execute('''INSERT INTO Questions(Question,Mark,Type,Module_ID) VALUES(?,?,?,?)''',
+                                  (question_text, mark, question_type, module_id)).lastrowid
+        answer_ids = []
+        for answer_text, is_right, description in answers:
+            answer_ids.append(con.execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right, Description)
+            VALUES(?,?,?,?)''', (question_id, answer_text, int(is_right), description)).lastrowid)
+    events.emit('Questions', 'insert', question_id)
+    for answer_id in answer_ids:
+        events.emit('Answers', 'insert', answer_id)
+    return question_id
+
+
+def update_question(question_id, question_text, mark):
+    """A function to change the text and mark of a question"""
+    execute('''UPDATE Questions SET question = ? , mark = ? WHERE ID = ?''', (question_text, mark, question_id))
+    events.emit('Questions', 'update', question_id)
+
+
+def delete_question(question_id):
+    """A function to delete a question together with its answers"""
+    with transaction() as con:
+        con.execute('''DELETE FROM Questions WHERE ID=(?)''', (question_id,))
+        con.execute('''DELETE FROM Answers WHERE Question_ID=(?)''', (question_id,))
+    events.emit('Questions', 'delete', question_id)
+
+
+def add_answer(question_id, answer_text, is_right, description=None):
+    """A function to add an answer to a question and return its ID"""
+    answer_id = execute('''INSERT INTO Answers(Question_ID, Answer, Is_Right, Description) VALUES(?,?,?,?)''',
+                        (question_id, answer_text, is_right, description)).lastrowid
+    events.emit('Answers', 'insert', answer_id)
+    return answer_id
+
+
+def update_answer(answer_id, answer_text, is_right):
+    """A function to change the text of an answer and whether it is right"""
+    execute('''UPDATE Answers SET answer = ? , Is_Right = ? WHERE ID = ?''', (answer_text, is_right, answer_id))
+    events.emit('Answers', 'update', answer_id)
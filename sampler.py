@@ -0,0 +1,283 @@
+"""Drawing the questions of a quiz. Instead of every question of a module being as likely as any other, a question is
+drawn with the weight 1 / (1 + Number), Number being how often it has been asked, so the questions asked least come
+up more and every question gets asked about as often over time. A quiz can also ask for a mix of question types or
+marks, like two True/False questions and three worth 2 marks, and the questions a taker got in their last few quizzes
+are left out while there are enough others to draw.
+
+The weights of a module are kept in Fenwick trees, one over every question and one for every type and every mark, so
+drawing a question and changing its weight both take O(log n) steps, a few microseconds even for a module of 100000
+questions. Alias tables would draw in O(1), but they have to be rebuilt in O(n) whenever a weight changes, and every
+question asked changes one. The usage counted by the quizzes of this process is applied straight away, and every
+refresh_interval seconds the counters are read again so the quizzes of other processes are counted as well; only the
+weights which changed are updated."""
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from itertools import chain
+
+import repository
+
+"""How often a draw may hit a question which is blocked, because it was drawn already or was asked lately, before the
+blocked questions are taken out of the trees for the rest of the draw"""
+MAX_REJECTIONS = 8
+
+
+def weight(number):
+    """A function to get the weight of a question which was asked number times"""
+    return 1.0 / (1 + number)
+
+
+class FenwickTree:
+    """A class keeping the prefix sums of a list of weights in a binary indexed tree, so a weight can be changed and
+    an index can be drawn in proportion to its weight in O(log n) steps"""
+    __slots__ = ('tree', 'weights', 'total')
+
+    def __init__(self, weights):
+        self.weights = array('d', weights)
+        self.tree = array('d', [0.0]) + self.weights
+        size = len(self.weights)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def update(self, index, new_weight):
+        delta = new_weight - self.weights[index]
+        if delta == 0:
+            return
+        self.weights[index] = new_weight
+        self.total += delta
+        tree = self.tree
+        size = len(tree)
+        i = index + 1
+        while i < size:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, value):
+        """A function to find the index whose weight covers value, counting from the first weight. Rounding in the
+        running sums can land it on a weight which is 0, so it then moves to the nearest index with a weight."""
+        tree = self.tree
+        size = len(self.weights)
+        position = 0
+        step = 1 << size.bit_length()
+        while step:
+            following = position + step
+            if following <= size and tree[following] <= value:
+                position = following
+                value -= tree[following]
+            step >>= 1
+        index = min(position, size - 1)
+        if self.weights[index] > 0:
+            return index
+        for candidate in chain(range(index - 1, -1, -1), range(index + 1, size)):
+            if self.weights[candidate] > 0:
+                return candidate
+        return None
+
+
+class ModuleSampler:
+    """A class drawing the questions of one module from its QuestionBank. usage is (ID, Type, Mark, Number) rows of
+    the questions; a question of the bank without one counts as never asked and belongs to no type or mark group."""
+
+    def __init__(self, module, bank, usage, refresh_interval=60.0):
+        self.module = module
+        self.bank = bank
+        self.refresh_interval = refresh_interval
+        self.loaded_at = time.monotonic()
+        size = len(bank)
+        types, marks, numbers = [None] * size, [None] * size, [0] * size
+        for question_id, question_type, mark, number in usage:
+            index = self.find(question_id)
+            if index is not None:
+                types[index], marks[index], numbers[index] = question_type, mark, number or 0
+        self.numbers = array('q', numbers)
+        weights = [weight(number) for number in numbers]
+        self.everything = FenwickTree(weights)
+        self.groups = {}
+        self.dimensions = []
+        for kind, values in (('type', types), ('mark', marks)):
+            members = {}
+            group_of = [None] * size
+            positions = array('q', bytes(8 * size))
+            for index, value in enumerate(values):
+                if value is not None:
+                    group = members.setdefault((kind, value), array('q'))
+                    positions[index] = len(group)
+                    group.append(index)
+            for key, group in members.items():
+                self.groups[key] = (FenwickTree([weights[index] for index in group]), group)
+                for index in group:
+                    group_of[index] = self.groups[key][0]
+            self.dimensions.append((group_of, positions))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, module, bank, refresh_interval=60.0):
+        return cls(module, bank, fetch_usage(module), refresh_interval)
+
+    def find(self, question_id):
+        try:
+            return self.bank.index(question_id)
+        except KeyError:
+            return None
+
+    def set_weight(self, index, new_weight):
+        """A function to change the weight of a question in every tree it is in"""
+        self.everything.update(index, new_weight)
+        for group_of, positions in self.dimensions:
+            tree = group_of[index]
+            if tree is not None:
+                tree.update(positions[index], new_weight)
+
+    def record_usage(self, question_id, count=1):
+        """A function to count that a question was asked, making it less likely to be drawn"""
+        with self._lock:
+            index = self.find(question_id)
+            if index is not None:
+                self.numbers[index] += count
+                self.set_weight(index, weight(self.numbers[index]))
+
+    def refresh(self):
+        """A function to read the usage counters of the module again and update the weights which changed. A counter
+        is never lowered, as the usage counted here may not have been written yet. The counters are read before the
+        lock is taken, so record_usage, which runs on the Tk thread and the event loop of the server, only ever waits
+        for the weights to be updated and never for the database."""
+        self.loaded_at = time.monotonic()
+        usage = fetch_usage(self.module)
+        with self._lock:
+            for question_id, _type, _mark, number in usage:
+                index = self.find(question_id)
+                if index is not None and (number or 0) > self.numbers[index]:
+                    self.numbers[index] = number
+                    self.set_weight(index, weight(number))
+
+    def draw(self, count, rng=random, mix=None, exclude=()):
+        """A function to draw up to count different questions. mix maps question types (strings) and marks (integers)
+        to how many questions of them to draw first; the rest are drawn from the whole module. The questions with the
+        IDs in exclude are only drawn when there are not enough others."""
+        if time.monotonic() - self.loaded_at >= self.refresh_interval:
+            self.refresh()
+        with self._lock:
+            chosen = []
+            removed = []
+            blocked = {index for index in map(self.find, exclude) if index is not None}
+            try:
+                for group, wanted in (mix or {}).items():
+                    entry = self.groups.get(('type', group) if isinstance(group, str) else ('mark', group))
+                    if entry is not None:
+                        self._draw_from(entry[0], entry[1], min(wanted, count - len(chosen)), rng, chosen, blocked,
+                                        removed)
+                self._draw_from(self.everything, None, count - len(chosen), rng, chosen, blocked, removed)
+                if len(chosen) < count and len(blocked) > len(chosen):
+                    self.restore(removed)
+                    blocked = set(chosen)
+                    self._draw_from(self.everything, None, count - len(chosen), rng, chosen, blocked, removed)
+            finally:
+                self.restore(removed)
+        return [self.bank.question(index) for index in chosen]
+
+    def _draw_from(self, tree, members, wanted, rng, chosen, blocked, removed):
+        """A function to draw wanted questions from one tree which are not blocked, blocking every question drawn so
+        it is not drawn twice. A blocked question which is hit is drawn again, which leaves the trees untouched; only
+        when the blocked questions carry most of the weight of the tree, so that happens again and again, are they
+        taken out of the trees, with their weights kept in removed to be put back after the draw."""
+        for _ in range(wanted):
+            for _attempt in range(MAX_REJECTIONS):
+                index = self._pick(tree, members, rng)
+                if index is None or index not in blocked:
+                    break
+            else:
+                for blocked_index in blocked:
+                    if self.everything.weights[blocked_index] > 0:
+                        removed.append((blocked_index, self.everything.weights[blocked_index]))
+                        self.set_weight(blocked_index, 0.0)
+                index = self._pick(tree, members, rng)
+            if index is None:
+                return
+            chosen.append(index)
+            blocked.add(index)
+
+    @staticmethod
+    def _pick(tree, members, rng):
+        if tree.total <= 1e-12:
+            return None
+        position = tree.find(rng.random() * tree.total)
+        if position is None or members is None:
+            return position
+        return members[position]
+
+    def restore(self, removed):
+        """A function to put back the weights of the questions a draw took out of the trees"""
+        for index, old_weight in reversed(removed):
+            self.set_weight(index, old_weight)
+        removed.clear()
+
+
+class QuestionSampler:
+    """A class keeping a ModuleSampler for the modules quizzes were drawn from lately, built again whenever the
+    question cache has a new bank for the module, and the questions every taker got in their last recent_quizzes
+    quizzes"""
+
+    def __init__(self, recent_quizzes=3, max_modules=64, max_takers=10000, refresh_interval=60.0):
+        self.recent_quizzes = recent_quizzes
+        self.max_modules = max_modules
+        self.max_takers = max_takers
+        self.refresh_interval = refresh_interval
+        self._samplers = OrderedDict()
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def module_sampler(self, module, bank):
+        with self._lock:
+            sampler = self._samplers.get(module)
+            if sampler is not None and sampler.bank is bank:
+                self._samplers.move_to_end(module)
+                return sampler
+        sampler = ModuleSampler.load(module, bank, self.refresh_interval)
+        with self._lock:
+            self._samplers[module] = sampler
+            self._samplers.move_to_end(module)
+            while len(self._samplers) > self.max_modules:
+                self._samplers.popitem(last=False)
+        return sampler
+
+    def draw(self, module, bank, count, taker=None, mix=None, rng=random):
+        """A function to draw the questions of a quiz on a module from its bank, see ModuleSampler.draw. Without a
+        taker no questions are left out for having been asked lately."""
+        exclude = ()
+        if taker is not None:
+            with self._lock:
+                exclude = [question_id for quiz in self._recent.get(taker, ()) for question_id in quiz]
+        questions = self.module_sampler(module, bank).draw(count, rng, mix, exclude)
+        if taker is not None:
+            with self._lock:
+                recent = self._recent.get(taker)
+                if recent is None:
+                    recent = self._recent[taker] = deque(maxlen=self.recent_quizzes)
+                recent.append(tuple(question.id for question in questions))
+                self._recent.move_to_end(taker)
+                while len(self._recent) > self.max_takers:
+                    self._recent.popitem(last=False)
+        return questions
+
+    def record_usage(self, module, question_id, count=1):
+        """A function to count that a question of a module was asked"""
+        with self._lock:
+            sampler = self._samplers.get(module)
+        if sampler is not None:
+            sampler.record_usage(question_id, count)
+
+
+def fetch_usage(module):
+    return repository.fetch_all('''SELECT ID, Type, Mark, Number FROM Questions
+    WHERE Module_ID = (SELECT ID FROM modules WHERE Name = ?)''', [module])
+
+
+question_sampler = QuestionSampler()
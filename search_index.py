@@ -0,0 +1,67 @@
+"""Searching the question bank through the FTS5 indexes which the migrations create over module names and codes,
+question text and answer text. Every word typed is matched as the start of a word, so "upp" finds "upper()", and the
+IDs come back best match first as ranked by FTS5. The text itself is never scanned, so a search over hundreds of
+thousands of rows takes milliseconds."""
+import re
+
+import repository
+
+"""The most hits a search returns, so a one letter query can not flood a TreeView"""
+SEARCH_LIMIT = 500
+
+
+def match_query(text):
+    """A function to turn what the user typed into an FTS5 query. Every word becomes a quoted prefix term, so
+    punctuation in the search box can never be read as FTS5 syntax, and all of the words have to match."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_modules(text, limit=SEARCH_LIMIT):
+    """A function to get the IDs of the modules whose name or code matches the search text"""
+    query = match_query(text)
+    if not query:
+        return []
+    rows = repository.fetch_all('''SELECT rowid FROM modules_fts WHERE modules_fts MATCH ? ORDER BY rank LIMIT ?''',
+                                (query, limit))
+    return [row[0] for row in rows]
+
+
+def search_questions(text, module_id=None, limit=SEARCH_LIMIT):
+    """A function to get the IDs of the questions whose text matches the search text, optionally only the ones in
+    one module"""
+    query = match_query(text)
+    if not query:
+        return []
+    if module_id is None:
+        rows = repository.fetch_all('''SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?
+        ORDER BY rank LIMIT ?''', (query, limit))
+    else:
+        rows = repository.fetch_all('''SELECT f.rowid FROM questions_fts f JOIN Questions q ON q.ID = f.rowid
+        WHERE questions_fts MATCH ? AND q.Module_ID = ? ORDER BY f.rank LIMIT ?''', (query, module_id, limit))
+    return [row[0] for row in rows]
+
+
+def search_answers(text, question_id=None, limit=SEARCH_LIMIT):
+    """A function to get the IDs of the answers whose text matches the search text, optionally only the ones of one
+    question"""
+    query = match_query(text)
+    if not query:
+        return []
+    if question_id is None:
+        rows = repository.fetch_all('''SELECT rowid FROM answers_fts WHERE answers_fts MATCH ? ORDER BY rank LIMIT ?''',
+                                    (query, limit))
+    else:
+        rows = repository.fetch_all('''SELECT f.rowid FROM answers_fts f JOIN Answers a ON a.ID = f.rowid
+        WHERE answers_fts MATCH ? AND a.Question_ID = ? ORDER BY f.rank LIMIT ?''', (query, question_id, limit))
+    return [row[0] for row in rows]
+
+
+def fetch_rows(sql, ids, key_column):
+    """A function to load the rows for a list of IDs, kept in the order of the list. The sql needs a single {} where
+    the placeholders of the IN (...) list go and key_column is the position of the ID in its rows."""
+    if not ids:
+        return []
+    rows = repository.fetch_all(sql.format(','.join('?' * len(ids))), list(ids))
+    rows_by_id = {row[key_column]: row for row in rows}
+    return [rows_by_id[row_id] for row_id in ids if row_id in rows_by_id]
@@ -0,0 +1,88 @@
+"""What the app does while it starts, and a way to measure how long that takes.
+
+The menu only imports the quiz features or the administrative features when their button is clicked, and the
+database is only opened by the first query, so the menu window shows without loading either of them. The startup
+time is measured from a cold start of python to the first window being drawn and ready for input:
+
+    python menu.py --startup-time                      the menu window
+    python menu.py --startup-time quiz --repeat 10     the menu, and then the quiz window opened from it
+    python menu.py --startup-time admin --budget 1500  the menu, and then the main window of the admin features
+
+Every run starts a fresh python process with QUIZ_STARTUP_PROBE set to the window to wait for. When that window is
+set up it calls ready(), which draws it and prints a line; the time from starting the process to reading that line is
+the startup time of the run, and the process is killed afterwards. The command fails when the median of the runs is
+over the budget, so a slow import or a query which creeps into the startup is noticed."""
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+PROBE = 'QUIZ_STARTUP_PROBE'
+BUDGETS_MS = {'menu': 500, 'quiz': 1000, 'admin': 1500}
+
+
+def probing():
+    """A function to get the name of the window a startup measurement is waiting for, or None in a normal run"""
+    return os.environ.get(PROBE)
+
+
+def ready(window, name):
+    """A function to call once the first window of the menu, the quiz or the administrative features is set up. In a
+    startup measurement waiting for that window, the window is drawn and the process reports that it is ready."""
+    if probing() == name:
+        window.update()
+        print('ready', flush=True)
+
+
+def setup_logging():
+    """A function to set up the logging to app.log, which is started afresh on every run. It is called when the app
+    is launched and not when a module is imported, so importing one does not truncate the log."""
+    import logging
+    logging.basicConfig(filename='app.log', filemode='w', format='%(name)s - %(levelname)s - %(message)s')
+
+
+def measure(script, name, repeat=5, timeout=30):
+    """A function to start script repeat times and return the seconds every run took until the window name was
+    ready"""
+    environment = dict(os.environ, **{PROBE: name})
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script], env=environment, stdout=subprocess.PIPE, text=True)
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            for line in process.stdout:
+                if line.strip() == 'ready':
+                    timings.append(time.perf_counter() - started)
+                    break
+            else:
+                raise RuntimeError(f'the {name} window was not ready, exit code {process.wait()}')
+        finally:
+            timer.cancel()
+            process.kill()
+            process.wait()
+            process.stdout.close()
+    return timings
+
+
+def main(script, argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog=os.path.basename(script),
+                                     description='Measure the time from a cold start to the first interactive window')
+    parser.add_argument('--startup-time', dest='window', nargs='?', const='menu', choices=tuple(BUDGETS_MS),
+                        required=True, help='the window to wait for, the menu by default')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float,
+                        help=f'the most milliseconds the median run may take, by default {BUDGETS_MS}')
+    arguments = parser.parse_args(argv)
+
+    timings = measure(script, arguments.window, arguments.repeat)
+    median = statistics.median(timings) * 1000
+    budget = arguments.budget or BUDGETS_MS[arguments.window]
+    print(f'{arguments.window}: best {min(timings) * 1000:.0f} ms, median {median:.0f} ms, '
+          f'worst {max(timings) * 1000:.0f} ms, budget {budget:.0f} ms')
+    if median > budget:
+        sys.exit(f'the startup of the {arguments.window} window is {median - budget:.0f} ms over its budget')
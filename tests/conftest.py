@@ -0,0 +1,16 @@
+import pytest
+
+import repository
+from question_cache import question_cache
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fixture pointing the shared connection pool at a new, migrated question bank in a temporary directory"""
+    pool = repository.ConnectionPool(str(tmp_path / 'question_bank.db'))
+    monkeypatch.setattr(repository, 'pool', pool)
+    repository.migrate()
+    question_cache.clear()
+    yield pool
+    question_cache.clear()
+    pool.close()
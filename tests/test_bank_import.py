@@ -0,0 +1,77 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+import bank_import
+import repository
+
+
+def question(text, module_code=1179, module_name='Math', answers=None):
+    return {'module_code': module_code, 'module_name': module_name, 'question': text, 'type': 'Single choice',
+            'mark': 1, 'answers': answers or [{'answer': '4', 'is_right': True}, {'answer': '5', 'is_right': False}]}
+
+
+def run(records, **options):
+    lines = io.StringIO(''.join(json.dumps(record) + '\n' for record in records))
+    return bank_import.Importer(progress=io.StringIO(), **options).run(bank_import.read_jsonl(lines))
+
+
+def imported():
+    return repository.fetch_all('''SELECT q.Question, m.Code FROM Questions q JOIN modules m ON m.ID = q.Module_ID
+    ORDER BY q.ID''')
+
+
+def test_questions_and_their_modules_are_imported(database):
+    importer = run([question('2 + 2 = ?'), question('3 + 1 = ?', module_code=2001, module_name='Art')])
+    assert (importer.questions, importer.answers, importer.modules) == (2, 4, 2)
+    assert imported() == [('2 + 2 = ?', 1179), ('3 + 1 = ?', 2001)]
+
+
+def test_answers_which_are_not_objects_are_skipped(database):
+    importer = run([question('bad', answers=['x']), question('good')])
+    assert (importer.questions, importer.invalid) == (1, 1)
+    assert imported() == [('good', 1179)]
+
+
+def test_unknown_module_without_a_name_is_skipped_and_the_batch_kept(database):
+    importer = run([question('first'), question('orphan', module_code=4242, module_name=None), question('second')])
+    assert (importer.questions, importer.invalid) == (2, 1)
+    assert imported() == [('first', 1179), ('second', 1179)]
+
+
+def test_module_code_with_a_leading_zero_finds_the_module(database):
+    repository.add_module('Math', 1179)
+    importer = run([question('2 + 2 = ?', module_code='01179', module_name=None)])
+    assert (importer.questions, importer.modules) == (1, 0)
+    assert imported() == [('2 + 2 = ?', 1179)]
+
+
+def test_module_code_which_is_not_a_number_is_invalid(database):
+    importer = run([question('2 + 2 = ?', module_code='abc')])
+    assert (importer.questions, importer.invalid) == (0, 1)
+
+
+def test_duplicates_are_skipped_across_chunked_lookups(database, monkeypatch):
+    monkeypatch.setattr(bank_import, 'MAX_VARIABLES', 3)
+    run([question(f'question {number}') for number in range(7)], batch_size=100)
+    importer = run([question(f'question {number}') for number in range(10)], batch_size=100)
+    assert (importer.questions, importer.duplicates) == (3, 7)
+
+
+def test_modules_of_a_rolled_back_batch_are_forgotten(database, monkeypatch):
+    importer = bank_import.Importer(progress=io.StringIO())
+    importer.started = 0
+    entry = bank_import.validate(question('2 + 2 = ?', module_code=3003, module_name='History'))
+
+    def locked(con, table):
+        raise sqlite3.OperationalError('database is locked')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bank_import, 'next_id', locked)
+        with pytest.raises(sqlite3.OperationalError):
+            importer.write_batch([entry])
+    assert importer.module_ids == {} and importer.modules == 0
+    importer.write_batch([entry])
+    assert imported() == [('2 + 2 = ?', 3003)]
@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import repository
+
+
+def aggregates(con):
+    return (con.execute('SELECT * FROM module_scores ORDER BY module_id').fetchall(),
+            con.execute('SELECT * FROM module_score_histogram ORDER BY module_id, score').fetchall())
+
+
+def rebuilt(con):
+    """A function to get the aggregates REBUILD_AGGREGATES works out from the results, leaving the maintained ones as
+    they were"""
+    con.execute('SAVEPOINT rebuild')
+    for statement in migrations.REBUILD_AGGREGATES:
+        con.execute(statement)
+    expected = aggregates(con)
+    con.execute('ROLLBACK TO rebuild')
+    con.execute('RELEASE rebuild')
+    return expected
+
+
+@pytest.fixture
+def results(database):
+    with repository.transaction() as con:
+        con.executemany('INSERT INTO modules(ID, Name, Code) VALUES(?,?,?)', [(1, 'Math', 1179), (2, 'Art', 2001)])
+        con.executemany('''INSERT INTO results(module_id, number_of_questions, number_of_correct_answers, time_taken)
+        VALUES(?,?,?,?)''', [(1, 5, score, f'2024-01-01 10:00:0{score}') for score in (1, 3, 3, 5)]
+                        + [(2, 5, 4, '2024-01-02 10:00:00')])
+    with database.connection() as con:
+        yield con
+
+
+def test_inserted_results_are_aggregated(results):
+    scores, histogram = aggregates(results)
+    assert scores == [(1, 4, 12, 44, 1, 5), (2, 1, 4, 16, 4, 4)]
+    assert histogram == [(1, 1, 1), (1, 3, 2), (1, 5, 1), (2, 4, 1)]
+    assert aggregates(results) == rebuilt(results)
+
+
+def test_updated_score_moves_between_histogram_rows(results):
+    with results:
+        results.execute('UPDATE results SET number_of_correct_answers = 2 WHERE number_of_correct_answers = 5')
+    scores, histogram = aggregates(results)
+    assert scores[0] == (1, 4, 9, 23, 1, 3)
+    assert (1, 5, 1) not in histogram and (1, 2, 1) in histogram
+    assert aggregates(results) == rebuilt(results)
+
+
+def test_result_moved_to_another_module(results):
+    with results:
+        results.execute('UPDATE results SET module_id = 2 WHERE number_of_correct_answers = 1')
+        results.execute('UPDATE results SET number_of_correct_answers = NULL WHERE module_id = 2 AND '
+                        'number_of_correct_answers = 4')
+    assert aggregates(results) == rebuilt(results)
+    with results:
+        results.execute('UPDATE results SET number_of_correct_answers = 4 WHERE number_of_correct_answers IS NULL')
+    assert aggregates(results) == rebuilt(results)
+
+
+def test_updating_other_columns_leaves_the_aggregates(results):
+    before = aggregates(results)
+    with results:
+        results.execute("UPDATE results SET time_taken = '2025-01-01 00:00:00'")
+    assert aggregates(results) == before
+
+
+def test_deleted_results_are_taken_out(results):
+    with results:
+        results.execute('DELETE FROM results WHERE number_of_correct_answers IN (1, 5)')
+    scores, _histogram = aggregates(results)
+    assert scores[0] == (1, 2, 6, 18, 3, 3)
+    assert aggregates(results) == rebuilt(results)
+    with results:
+        results.execute('DELETE FROM results WHERE module_id = 2')
+    scores, histogram = aggregates(results)
+    assert [row[0] for row in scores] == [1]
+    assert all(row[0] == 1 for row in histogram)
+
+
+def test_rebuild_matches_the_triggers_after_many_changes(results):
+    with results:
+        results.execute('UPDATE results SET number_of_correct_answers = number_of_correct_answers + 1')
+        results.execute('DELETE FROM results WHERE number_of_correct_answers = 4 AND module_id = 1')
+        results.execute('''INSERT INTO results(module_id, number_of_questions, number_of_correct_answers, time_taken)
+        VALUES(2, 5, 0, '2024-02-01 00:00:00')''')
+    expected = aggregates(results)
+    with results:
+        for statement in migrations.REBUILD_AGGREGATES:
+            results.execute(statement)
+    assert aggregates(results) == expected
+
+
+def test_modules_sharing_a_code_are_named_before_the_unique_index(tmp_path):
+    con = sqlite3.connect(str(tmp_path / 'question_bank.db'), isolation_level=None)
+    for statement in migrations.MIGRATIONS[0]:
+        con.execute(statement)
+    con.execute('PRAGMA user_version = 1')
+    con.executemany('INSERT INTO modules(Name, Code) VALUES(?,?)', [('Math', 1179), ('Maths', 1179), ('Art', 2001)])
+    with pytest.raises(sqlite3.IntegrityError, match='code 1179: modules 1 Math, 2 Maths'):
+        migrations.migrate(con)
+    assert migrations.get_version(con) == 1
+    con.execute('UPDATE modules SET Code = 1180 WHERE ID = 2')
+    assert migrations.migrate(con) == migrations.SCHEMA_VERSION
+    con.close()
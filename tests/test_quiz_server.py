@@ -0,0 +1,63 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import repository
+from quiz_server import QuizServer
+
+
+def exchange(server, request):
+    """A function to send one raw request to a running QuizServer and return the status and the JSON body of the
+    reply"""
+    async def talk():
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers['content-length']))
+            writer.close()
+            return int(status_line.split()[1]), json.loads(body)
+        finally:
+            listener.close()
+            await listener.wait_closed()
+    return asyncio.run(talk())
+
+
+@pytest.fixture
+def server(database):
+    server = QuizServer(workers=1)
+    yield server
+    server.executor.shutdown()
+
+
+def test_modules_are_listed(server):
+    repository.add_module('Math', 1179)
+    status, payload = exchange(server, b'GET /modules HTTP/1.1\r\nConnection: close\r\n\r\n')
+    assert status == 200
+    assert payload == [{'id': 1, 'name': 'Math', 'code': 1179}]
+
+
+def test_handler_exception_is_a_500(server, monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(server, 'list_modules', locked)
+    status, payload = exchange(server, b'GET /modules HTTP/1.1\r\nConnection: close\r\n\r\n')
+    assert status == 500
+    assert payload == {'error': 'Internal server error'}
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5'])
+def test_bad_content_length_is_a_400(server, length):
+    status, payload = exchange(server, b'POST /quiz HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n')
+    assert status == 400
+    assert payload == {'error': 'Malformed Content-Length'}
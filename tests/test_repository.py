@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import repository
+
+
+def wait_for_waiters(pool, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(pool._waiters) < count:
+        assert time.monotonic() < deadline, 'the callers did not start waiting'
+        time.sleep(0.001)
+
+
+def test_waiting_callers_get_connections_in_order(tmp_path):
+    pool = repository.ConnectionPool(str(tmp_path / 'question_bank.db'), size=1)
+    order = []
+
+    def take(name):
+        with pool.connection():
+            order.append(name)
+
+    held = pool.acquire()
+    threads = []
+    for number, name in enumerate(['first', 'second', 'third'], 1):
+        thread = threading.Thread(target=take, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_for_waiters(pool, number)
+    pool.release(held)
+    for thread in threads:
+        thread.join(5)
+    assert order == ['first', 'second', 'third']
+    pool.close()
+
+
+def test_new_caller_does_not_take_a_connection_ahead_of_a_waiting_one(tmp_path):
+    pool = repository.ConnectionPool(str(tmp_path / 'question_bank.db'), size=1)
+    order = []
+
+    def take():
+        with pool.connection():
+            order.append('waiting')
+            time.sleep(0.01)
+
+    held = pool.acquire()
+    thread = threading.Thread(target=take)
+    thread.start()
+    wait_for_waiters(pool, 1)
+    pool.release(held)
+    with pool.connection():
+        order.append('new')
+    thread.join(5)
+    assert order == ['waiting', 'new']
+    pool.close()
+
+
+def test_acquire_times_out_when_every_connection_is_busy(tmp_path):
+    pool = repository.ConnectionPool(str(tmp_path / 'question_bank.db'), size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError, match='timed out'):
+        pool.acquire()
+    assert not pool._waiters
+    pool.release(held)
+    pool.close()
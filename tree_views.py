@@ -0,0 +1,216 @@
+"""The TreeView widgets shared by the administrative features and the quiz features. We import ttk for the Treeview
+and the Scrollbar."""
+from bisect import bisect
+from tkinter import *
+from tkinter import ttk
+
+import repository
+from db_worker import worker
+from instrumentation import timed
+
+
+class TreeView(Frame):
+    """We are inheriting the tkinter object, Frame here so that we can treat this class as the object itself when it
+    comes to creating the UI for our app.
+
+    One could say that we are using polymorphism here as we are using the same class to create three different
+    types of TreeViews and have a search function in this class which work with all different TreeViews. """
+
+    def __init__(self, master, columns):
+        Frame.__init__(self, master)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.tree = ttk.Treeview(self, column=columns, show='headings')
+        self.tree.grid(row=0, column=0, sticky='NEWS')
+
+    def search(self, query):
+
+        """This function is the core of our search functionality. It takes and stores the user query from the search
+        entry to a private? variable and then iterates through all the children in the TreeView and tries to compare
+        the search query in lowercase with all relevant TreeView children values in lowercase. If it finds a match,
+        it will append the value of that child to a list we name selections. Then we select the items in selections
+        visually in our TreeView to show the results to the user. """
+
+        _selections = []
+        for child in self.tree.get_children():
+            if query.lower() in self.tree.item(child)['values'][1].lower():
+                _selections.append(child)
+
+            if query in str(self.tree.item(child)['values'][0]):
+                _selections.append(child)
+        self.tree.selection_set(_selections)
+        _selections = []
+
+
+class PagedTreeView(TreeView):
+    """A TreeView which never loads a whole table at once. Rows are fetched one page at a time with keyset
+    pagination: fetch_page(after, limit) gets the key of the last row already shown (None for the first page) and
+    returns at most limit rows ordered by that key, which is the value at key_column in every row. The next page is
+    only fetched when the user scrolls close to the bottom of what is loaded, so opening a table with tens of
+    thousands of rows costs the same as opening one with a single page of them.
+
+    The key of a row is also used as its item id in the Treeview, so it has to be unique. When search_rows is given,
+    search(query) asks it for the rows matching the query, best match first, instead of looking through the rows
+    which happen to be loaded.
+
+    When table is given the TreeView follows the change events of that table and patches only the row that was
+    inserted, updated or deleted, so the keys have to be the integer IDs of that table.
+
+    Every page, search and changed row is fetched on the database worker, so fetch_page and search_rows run on the
+    worker thread and must not touch any widget."""
+
+    def __init__(self, master, columns, fetch_page, key_column, page_size=100, search_rows=None, table=None):
+        TreeView.__init__(self, master, columns)
+        self.fetch_page = fetch_page
+        self.search_rows = search_rows
+        self.key_column = key_column
+        self.page_size = page_size
+        self.table = table
+        self.last_key = None
+        self.exhausted = False
+        self.filtered = False
+        self._load_pending = False
+        self._loading = False
+        self._generation = 0
+        self.scrollbar = ttk.Scrollbar(self, orient=VERTICAL, command=self.tree.yview)
+        self.scrollbar.grid(row=0, column=1, sticky='NS')
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self._listener = worker.on_ui_thread(self.apply_change)
+        if self.table is not None:
+            repository.events.subscribe(self.table, self._listener)
+
+    def destroy(self):
+        """A function to stop following the change events when the TreeView goes away"""
+        if self.table is not None:
+            repository.events.unsubscribe(self.table, self._listener)
+        TreeView.destroy(self)
+
+    def on_scroll(self, first, last):
+        """A function called by the Treeview whenever the visible part of it changes. It moves the scrollbar and asks
+        for the next page once the bottom tenth of the loaded rows comes into view."""
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.exhausted and not self._load_pending:
+            self._load_pending = True
+            self.after_idle(self.load_more)
+
+    @timed('tree.refresh')
+    def refresh(self):
+        """A function to throw away every loaded row and show the first page again. A page which is still being
+        fetched for the rows thrown away is dropped when it arrives."""
+        self.tree.delete(*self.tree.get_children())
+        self.last_key = None
+        self.exhausted = False
+        self.filtered = False
+        self._loading = False
+        self._generation += 1
+        self.load_more()
+
+    @timed('tree.load_more')
+    def load_more(self):
+        """A function to fetch the page after the last loaded row on the database worker. The page is added to the
+        bottom of the TreeView when it arrives."""
+        self._load_pending = False
+        if self.exhausted or self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+        worker.submit(self, self.fetch_page, self.last_key, self.page_size,
+                      on_done=lambda rows: self.add_page(rows, generation),
+                      on_error=lambda error: self.load_failed(error, generation))
+
+    def add_page(self, rows, generation):
+        """A function to add a fetched page to the bottom of the TreeView, unless the TreeView was refreshed or
+        searched since it was asked for"""
+        if generation != self._generation:
+            return
+        self._loading = False
+        for row in rows:
+            self.tree.insert("", END, iid=str(row[self.key_column]), values=row)
+        if rows:
+            self.last_key = rows[-1][self.key_column]
+        if len(rows) < self.page_size:
+            self.exhausted = True
+
+    def load_failed(self, error, generation):
+        """A function to let the next scroll try the page again after fetching it failed, and show the error"""
+        if generation == self._generation:
+            self._loading = False
+        worker.show_error(error)
+
+    @timed('tree.search')
+    def search(self, query):
+        """A function to show only the rows matching the query and select them. The rows come from the search index
+        through search_rows, so rows which were not loaded yet are found too. Searching for nothing shows the whole
+        table again. Without search_rows the loaded rows are searched like in any other TreeView."""
+        if self.search_rows is None:
+            return TreeView.search(self, query)
+        if query.strip() == "":
+            self.refresh()
+            return
+        self._generation += 1
+        self.filtered = True
+        generation = self._generation
+        worker.submit(self, self.search_rows, query, on_done=lambda rows: self.show_hits(rows, generation))
+
+    def clear_search(self):
+        """A function to show the whole table again when the search is closed, so the TreeView pages and follows
+        inserted rows like before. A search which is still running is dropped."""
+        if self.filtered:
+            self.refresh()
+
+    def show_hits(self, rows, generation):
+        """A function to replace the rows of the TreeView with the hits of a search and select them"""
+        if generation != self._generation:
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.last_key = None
+        self.exhausted = True
+        self.filtered = True
+        self._loading = False
+        for row in rows:
+            self.tree.insert("", END, iid=str(row[self.key_column]), values=row)
+        self.tree.selection_set([str(row[self.key_column]) for row in rows])
+
+    def fetch_row(self, row_id):
+        """A function to fetch the row with a given key, or None if it does not belong in this TreeView. It asks for
+        the one row which comes after row_id - 1, which can only be the row itself if that row is shown here."""
+        rows = self.fetch_page(row_id - 1, 1)
+        if rows and rows[0][self.key_column] == row_id:
+            return rows[0]
+        return None
+
+    def apply_change(self, action, row_id):
+        """A function to patch the TreeView after a change event. A deleted row is removed and an updated row is
+        fetched again if it is loaded. An inserted row is added in its place if it falls inside the loaded rows; if it
+        comes after them, the next page will bring it in anyway. Rows are fetched on the database worker."""
+        iid = str(row_id)
+        if action == 'delete':
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        elif action == 'update':
+            if self.tree.exists(iid):
+                worker.submit(self, self.fetch_row, row_id, on_done=lambda row: self.patch_row(row_id, row))
+        elif action == 'insert' and not self.filtered and not self.tree.exists(iid):
+            if not self.exhausted and (self.last_key is None or row_id > self.last_key):
+                return
+            worker.submit(self, self.fetch_row, row_id, on_done=lambda row: self.insert_row(row_id, row))
+
+    def patch_row(self, row_id, row):
+        """A function to show the fetched values of an updated row, or remove it if it no longer belongs here"""
+        iid = str(row_id)
+        if not self.tree.exists(iid):
+            return
+        if row is None:
+            self.tree.delete(iid)
+        else:
+            self.tree.item(iid, values=row)
+
+    def insert_row(self, row_id, row):
+        """A function to insert a fetched new row in its place among the loaded rows"""
+        iid = str(row_id)
+        if row is None or self.filtered or self.tree.exists(iid):
+            return
+        keys = [int(child) for child in self.tree.get_children()]
+        self.tree.insert("", bisect(keys, row_id), iid=iid, values=row)
+        if self.last_key is None or row_id > self.last_key:
+            self.last_key = row_id
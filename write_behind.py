@@ -0,0 +1,85 @@
+"""A write-behind buffer for the writes a quiz makes. Instead of running an UPDATE and a commit for every answer
+clicked, the usage counters of the questions and the result rows are collected in memory and written to the database
+together in one transaction."""
+import atexit
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+import repository
+
+
+class WriteBehindBuffer:
+    """A class to collect question usage increments and quiz results and flush them in one transaction. A flush
+    happens when a quiz is finished, when the flush interval has passed since the first pending write and when the
+    program exits, so nothing that was collected is lost on a normal shutdown. Failed flushes are counted in
+    failed_flushes, with the error of the last one in last_error."""
+
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._usage = {}
+        self._results = []
+        self._timer = None
+        self.failed_flushes = 0
+        self.last_error = None
+        atexit.register(self.flush)
+
+    def add_usage(self, question_id, count=1):
+        """A function to count that a question was asked in a quiz"""
+        with self._lock:
+            self._usage[question_id] = self._usage.get(question_id, 0) + count
+            self._schedule()
+
+    def add_result(self, module, number_of_questions, number_of_correct_answers):
+        """A function to queue the result of a finished quiz. The time is taken now and not when the row is written
+        so that it is the time the quiz was finished."""
+        time_taken = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._results.append((module, number_of_questions, number_of_correct_answers, time_taken))
+            self._schedule()
+
+    def flush(self):
+        """A function to write everything that is pending to the database in a single transaction. If the write
+        fails the pending writes are put back so they are tried again on the next flush."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            usage, self._usage = self._usage, {}
+            results, self._results = self._results, []
+        if not usage and not results:
+            return
+
+        try:
+            with repository.transaction() as con:
+                con.executemany('''UPDATE Questions SET Number = Number + ? WHERE ID = ?''',
+                                [(count, question_id) for question_id, count in usage.items()])
+                con.executemany("INSERT INTO results(module_id, number_of_questions, number_of_correct_answers, "
+                                "time_taken) VALUES((SELECT id FROM modules WHERE name=?),?,?,?)", results)
+        except sqlite3.Error as e:
+            logging.error(e)
+            with self._lock:
+                self.failed_flushes += 1
+                self.last_error = e
+                for question_id, count in usage.items():
+                    self._usage[question_id] = self._usage.get(question_id, 0) + count
+                self._results[:0] = results
+                self._schedule()
+
+    def close(self):
+        """A function to flush the buffer for the last time and stop it from being flushed again when the program
+        exits, for a buffer which is not needed any more"""
+        atexit.unregister(self.flush)
+        self.flush()
+
+    def _schedule(self):
+        """A function to start the flush timer if it is not running yet. It has to be called with the lock held."""
+        if self._timer is None and self.flush_interval is not None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+write_buffer = WriteBehindBuffer()